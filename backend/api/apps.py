@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        import api.cache  # noqa: F401
+        import api.metrics  # noqa: F401
+        import api.search  # noqa: F401
@@ -0,0 +1,59 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import URLPattern
+
+from api.metrics import timer
+
+ASYNC_READ_ROUTES = {
+    "recipes-list",
+    "recipes-detail",
+    "tags-list",
+    "tags-detail",
+    "ingredients-list",
+    "ingredients-detail",
+    "users-subscriptions",
+}
+
+
+def run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if response.streaming or not hasattr(response, "render"):
+            return response
+        with timer("render"):
+            response.render()
+        rendered = HttpResponse(response.content, status=response.status_code)
+        for header, value in response.items():
+            rendered[header] = value
+        rendered.cookies = response.cookies
+        return rendered
+    finally:
+        close_old_connections()
+
+
+def as_async_view(view):
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await sync_to_async(run_view, thread_sensitive=False)(
+            view, request, *args, **kwargs
+        )
+
+    return async_view
+
+
+def make_async_routes(patterns, names=ASYNC_READ_ROUTES):
+    return [
+        URLPattern(
+            pattern.pattern,
+            as_async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
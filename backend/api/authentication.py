@@ -0,0 +1,39 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from api.cache import auth_token_cache
+
+DEFERRED_USER_FIELDS = ("user__followers_count", "user__recipes_count")
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def get_token(self, key):
+        model = self.get_model()
+        try:
+            return (
+                model.objects.select_related("user")
+                .defer(*DEFERRED_USER_FIELDS)
+                .get(key=key)
+            )
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+    def authenticate_credentials(self, key):
+        cache_key = auth_token_cache.make_key(key)
+        token = auth_token_cache.get(cache_key)
+        if token is None:
+            token = self.get_token(key)
+            auth_token_cache.set(cache_key, token)
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return token.user, token
+
+    @staticmethod
+    def get_stats():
+        return {
+            **auth_token_cache.get_stats(),
+            "hit_rate": auth_token_cache.get_hit_rate(),
+        }
@@ -0,0 +1,141 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {"email", "username", "first_name", "last_name"}
+
+
+class CountingCache:
+    def __init__(self, prefix, timeout):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        data = cache.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, self.timeout)
+
+    def get_stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def get_hit_rate(self):
+        stats = self.get_stats()
+        total = stats["hits"] + stats["misses"]
+        return stats["hits"] / total if total else None
+
+
+class ResponseCache(CountingCache):
+    def __init__(self, prefix, timeout):
+        super().__init__(prefix, timeout)
+        self.generation_key = f"{prefix}:generation"
+
+    def get_generation(self):
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            cache.add(self.generation_key, time.time_ns(), timeout=None)
+            return cache.get(self.generation_key)
+        return generation
+
+    def bump_generation(self):
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, time.time_ns(), timeout=None)
+
+    def make_key(self, request):
+        params = sorted(
+            (key, value)
+            for key in request.query_params
+            for value in request.query_params.getlist(key)
+        )
+        digest = hashlib.blake2b(
+            repr(
+                (
+                    request.build_absolute_uri(request.path),
+                    params,
+                    request.accepted_renderer.format,
+                )
+            ).encode(),
+            digest_size=16,
+        ).hexdigest()
+        return f"{self.prefix}:{self.get_generation()}:{digest}"
+
+
+class TokenCache(CountingCache):
+    def make_key(self, token_key):
+        digest = hashlib.blake2b(token_key.encode(), digest_size=16)
+        return f"{self.prefix}:{digest.hexdigest()}"
+
+    def delete(self, token_keys):
+        cache.delete_many([self.make_key(key) for key in token_keys])
+
+
+recipe_response_cache = ResponseCache(
+    "recipes", settings.RECIPE_CACHE_TIMEOUT
+)
+auth_token_cache = TokenCache("auth_tokens", settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+@receiver(m2m_changed, sender=RecipeTag)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipe_response_cache(**kwargs):
+    transaction.on_commit(recipe_response_cache.bump_generation)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_recipe_author_cache(update_fields=None, **kwargs):
+    if update_fields and not AUTHOR_FIELDS & set(update_fields):
+        return
+    invalidate_recipe_response_cache()
+
+
+def invalidate_auth_tokens(token_keys):
+    auth_token_cache.delete(token_keys)
+    transaction.on_commit(lambda: auth_token_cache.delete(token_keys))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_auth_tokens(instance, **kwargs):
+    token_keys = list(
+        Token.objects.filter(user=instance).values_list("key", flat=True)
+    )
+    if token_keys:
+        invalidate_auth_tokens(token_keys)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_auth_token(instance, **kwargs):
+    invalidate_auth_tokens([instance.key])
@@ -0,0 +1,152 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+
+from api.metrics import timer
+from recipes.models import Follow, Recipe, RecipeIngredient, RecipeTag
+
+User = get_user_model()
+
+RECIPE_VALUES = (
+    "id",
+    "author_id",
+    "name",
+    "image",
+    "image_variants",
+    "text",
+    "cooking_time",
+    "pub_date",
+    "is_favorited",
+    "is_in_shopping_cart",
+)
+IMAGE_VARIANTS = ("small", "small_webp", "medium", "medium_webp")
+
+
+class FastRecipeReadSerializer:
+    def __init__(self, rows, context):
+        self.rows = list(rows)
+        self.request = context.get("request")
+        self.storage = Recipe._meta.get_field("image").storage
+        self.urls = {}
+
+    @staticmethod
+    def get_rows(queryset):
+        return queryset.prefetch_related(None).values(*RECIPE_VALUES)
+
+    @property
+    def data(self):
+        with timer("serialize"):
+            return self.to_representation()
+
+    def get_url(self, name):
+        if not name:
+            return None
+        url = self.urls.get(name)
+        if url is None:
+            url = self.storage.url(name)
+            if self.request is not None:
+                url = self.request.build_absolute_uri(url)
+            self.urls[name] = url
+        return url
+
+    def get_user_id(self):
+        user = getattr(self.request, "user", None)
+        if user is None or not user.is_authenticated:
+            return None
+        return user.id
+
+    def get_authors(self):
+        rows = (
+            User.objects.filter(
+                pk__in={row["author_id"] for row in self.rows}
+            )
+            .annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(
+                        user_id=self.get_user_id(), author=OuterRef("pk")
+                    )
+                )
+            )
+            .values(
+                "email",
+                "id",
+                "username",
+                "first_name",
+                "last_name",
+                "is_subscribed",
+            )
+        )
+        return {row["id"]: row for row in rows}
+
+    def get_tags(self, recipe_ids):
+        tags = defaultdict(list)
+        rows = (
+            RecipeTag.objects.filter(recipe_id__in=recipe_ids)
+            .order_by("tag_id")
+            .values_list(
+                "recipe_id", "tag_id", "tag__name", "tag__color", "tag__slug"
+            )
+        )
+        for recipe_id, pk, name, color, slug in rows:
+            tags[recipe_id].append(
+                {"id": pk, "name": name, "color": color, "slug": slug}
+            )
+        return tags
+
+    def get_ingredients(self, recipe_ids):
+        ingredients = defaultdict(list)
+        rows = (
+            RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+            .order_by("pk")
+            .values_list(
+                "recipe_id",
+                "ingredient_id",
+                "ingredient__name",
+                "ingredient__measurement_unit",
+                "amount",
+            )
+        )
+        for recipe_id, pk, name, measurement_unit, amount in rows:
+            ingredients[recipe_id].append(
+                {
+                    "id": pk,
+                    "name": name,
+                    "measurement_unit": measurement_unit,
+                    "amount": amount,
+                }
+            )
+        return ingredients
+
+    def to_representation(self):
+        if not self.rows:
+            return []
+        recipe_ids = [row["id"] for row in self.rows]
+        authors = self.get_authors()
+        tags = self.get_tags(recipe_ids)
+        ingredients = self.get_ingredients(recipe_ids)
+        data = []
+        for row in self.rows:
+            image = row["image"]
+            variants = row["image_variants"]
+            data.append(
+                {
+                    "id": row["id"],
+                    "tags": tags[row["id"]],
+                    "author": authors[row["author_id"]],
+                    "ingredients": ingredients[row["id"]],
+                    "name": row["name"],
+                    "image": self.get_url(image),
+                    **{
+                        f"image_{variant}": self.get_url(
+                            variants.get(variant) or image
+                        )
+                        for variant in IMAGE_VARIANTS
+                    },
+                    "text": row["text"],
+                    "cooking_time": row["cooking_time"],
+                    "is_favorited": row["is_favorited"],
+                    "is_in_shopping_cart": row["is_in_shopping_cart"],
+                }
+            )
+        return data
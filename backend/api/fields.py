@@ -1,16 +1,117 @@
 import base64
+import binascii
+import tempfile
 import uuid
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+BASE64_CHUNK_SIZE = 64 * 1024
 
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        "invalid_base64": "Некорректное изображение в формате base64",
+        "max_bytes": "Размер изображения не должен превышать {max_bytes} байт",
+        "max_pixels": (
+            "Изображение не должно содержать больше {max_pixels} пикселей"
+        ),
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith("data:image"):
-            img_format, img_str = data.split(";base64,")
-            ext = img_format.split("/")[-1]
-            data = ContentFile(
-                base64.b64decode(img_str), name=f"{uuid.uuid4()}.{ext}"
-            )
+            data = self.decode_image(data.partition(";base64,")[2])
         return super().to_internal_value(data)
+
+    def decode_image(self, img_str):
+        max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+        if len(img_str) // 4 * 3 > max_bytes + 2:
+            self.fail("max_bytes", max_bytes=max_bytes)
+        file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            for start in range(0, len(img_str), BASE64_CHUNK_SIZE):
+                chunk = img_str[start:start + BASE64_CHUNK_SIZE]
+                try:
+                    file.write(base64.b64decode(chunk, validate=True))
+                except binascii.Error:
+                    self.fail("invalid_base64")
+            if file.tell() > max_bytes:
+                self.fail("max_bytes", max_bytes=max_bytes)
+            file.seek(0)
+            ext = self.detect_format(file)
+            file.seek(0)
+        except Exception:
+            file.close()
+            raise
+        return File(file, name=f"{uuid.uuid4()}.{ext}")
+
+    def detect_format(self, file):
+        max_pixels = settings.IMAGE_UPLOAD_MAX_PIXELS
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+                image_format = image.format
+        except (OSError, Image.DecompressionBombError):
+            self.fail("invalid_image")
+        if width * height > max_pixels:
+            self.fail("max_pixels", max_pixels=max_pixels)
+        return image_format.lower()
+
+
+class ImageVariantField(serializers.ReadOnlyField):
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs.setdefault("source", "*")
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        name = recipe.image_variants.get(self.variant) or recipe.image.name
+        if not name:
+            return None
+        url = recipe.image.storage.url(name)
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, "__iter__"):
+            self.fail("not_a_list", input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail("empty")
+        return self.child_relation.to_internal_values(data)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_internal_values(self, data):
+        queryset = self.get_queryset()
+        pk_field = queryset.model._meta.pk
+        pks = []
+        for value in data:
+            if isinstance(value, bool):
+                self.fail("incorrect_type", data_type=type(value).__name__)
+            try:
+                pks.append(pk_field.to_python(value))
+            except ValidationError:
+                self.fail("incorrect_type", data_type=type(value).__name__)
+        objects = queryset.in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                self.fail("does_not_exist", pk_value=pk)
+        return [objects[pk] for pk in pks]
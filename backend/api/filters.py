@@ -1,15 +1,38 @@
+from django.db.models import BooleanField, Case, Value, When
 from django_filters import rest_framework as filters
 
 from recipes.models import Ingredient, Recipe, Tag
 
 
 class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(field_name="name", lookup_expr="istartswith")
+    name = filters.CharFilter(method="filter_name")
 
     class Meta:
         model = Ingredient
         fields = ("name",)
 
+    @staticmethod
+    def filter_name(queryset, name, value):
+        return (
+            queryset.filter(name__icontains=value)
+            .annotate(
+                is_prefix=Case(
+                    When(name__istartswith=value, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                )
+            )
+            .order_by("-is_prefix", "pk")
+        )
+
+
+class RecipeOrderingFilter(filters.OrderingFilter):
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        ordering = [self.get_ordering_value(param) for param in value]
+        return qs.order_by(*ordering, *Recipe._meta.ordering)
+
 
 class RecipeFilter(filters.FilterSet):
     author = filters.CharFilter(field_name="author")
@@ -20,7 +43,22 @@ class RecipeFilter(filters.FilterSet):
     )
     is_favorited = filters.BooleanFilter()
     is_in_shopping_cart = filters.BooleanFilter()
+    search = filters.CharFilter(method="filter_search")
+    ordering = RecipeOrderingFilter(fields=("favorites_count", "pub_date"))
 
     class Meta:
         model = Recipe
-        fields = ("author", "tags", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "author",
+            "tags",
+            "is_favorited",
+            "is_in_shopping_cart",
+            "search",
+            "ordering",
+        )
+
+    @staticmethod
+    def filter_search(queryset, name, value):
+        if not value.strip():
+            return queryset
+        return queryset.search(value)
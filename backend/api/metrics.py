@@ -0,0 +1,350 @@
+import asyncio
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from api.cache import auth_token_cache, recipe_response_cache
+from foodgram.db.base import get_pool_stats
+
+HTTP_METHODS = {"GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE"}
+TIMINGS = ("sql", "serialize", "render")
+
+current_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.endpoint = "unmatched"
+        self.sql_count = 0
+        self.timings = dict.fromkeys(TIMINGS, 0.0)
+        self.active = set()
+
+    def get_server_timing(self, total):
+        return ", ".join(
+            [
+                f'sql;dur={self.timings["sql"] * 1000:.1f};'
+                f'desc="{self.sql_count} SQL"',
+                *(
+                    f"{name};dur={self.timings[name] * 1000:.1f}"
+                    for name in TIMINGS[1:]
+                ),
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+
+@contextmanager
+def timer(name):
+    stats = current_stats.get()
+    if stats is None or name in stats.active:
+        yield
+        return
+    stats.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.timings[name] += time.perf_counter() - started
+        stats.active.discard(name)
+
+
+def sql_timer(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is not None:
+        stats.sql_count += 1
+    with timer("sql"):
+        return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_sql_timer(sender, connection, **kwargs):
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with timer("serialize"):
+            return super().to_representation(instance)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+
+class EndpointMetrics:
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.statuses = {}
+        self.sql_count = 0
+        self.timings = dict.fromkeys(TIMINGS, 0.0)
+        self.response_bytes = 0
+
+    def observe(self, stats, status, duration, size):
+        self.latency.observe(duration)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.sql_count += stats.sql_count
+        for name, value in stats.timings.items():
+            self.timings[name] += value
+        self.response_bytes += size
+
+
+def format_labels(**labels):
+    return ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+
+
+def format_metric(name, kind, help_text, samples):
+    yield f"# HELP {name} {help_text}"
+    yield f"# TYPE {name} {kind}"
+    for suffix, labels, value in samples:
+        yield f"{name}{suffix}{{{format_labels(**labels)}}} {value}"
+
+
+def get_endpoint_labels(endpoints):
+    for (view, method), endpoint in endpoints:
+        yield {"endpoint": view, "method": method}, endpoint
+
+
+class RequestMetrics:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stats, method, status, duration, size):
+        if method not in HTTP_METHODS:
+            method = "OTHER"
+        key = (stats.endpoint, method)
+        with self._lock:
+            endpoint = self.endpoints.get(key)
+            if endpoint is None:
+                endpoint = self.endpoints[key] = EndpointMetrics(self.buckets)
+            endpoint.observe(stats, status, duration, size)
+
+    def get_latency_samples(self, endpoints):
+        bounds = [*map(str, self.buckets), "+Inf"]
+        for labels, endpoint in get_endpoint_labels(endpoints):
+            cumulative = 0
+            for bound, count in zip(bounds, endpoint.latency.counts):
+                cumulative += count
+                yield "_bucket", {**labels, "le": bound}, cumulative
+            yield "_sum", labels, endpoint.latency.total
+            yield "_count", labels, cumulative
+
+    def render(self):
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            yield from format_metric(
+                "foodgram_request_duration_seconds",
+                "histogram",
+                "Время обработки запроса",
+                self.get_latency_samples(endpoints),
+            )
+            yield from format_metric(
+                "foodgram_requests_total",
+                "counter",
+                "Число запросов по кодам ответа",
+                (
+                    ("", {**labels, "status": status}, count)
+                    for labels, endpoint in get_endpoint_labels(endpoints)
+                    for status, count in sorted(endpoint.statuses.items())
+                ),
+            )
+            yield from format_metric(
+                "foodgram_request_sql_queries_total",
+                "counter",
+                "Число SQL-запросов",
+                (
+                    ("", labels, endpoint.sql_count)
+                    for labels, endpoint in get_endpoint_labels(endpoints)
+                ),
+            )
+            for name in TIMINGS:
+                yield from format_metric(
+                    f"foodgram_request_{name}_seconds_total",
+                    "counter",
+                    f"Суммарное время этапа {name}",
+                    (
+                        ("", labels, endpoint.timings[name])
+                        for labels, endpoint in get_endpoint_labels(endpoints)
+                    ),
+                )
+            yield from format_metric(
+                "foodgram_response_bytes_total",
+                "counter",
+                "Суммарный размер ответов",
+                (
+                    ("", labels, endpoint.response_bytes)
+                    for labels, endpoint in get_endpoint_labels(endpoints)
+                ),
+            )
+
+
+request_metrics = RequestMetrics(settings.REQUEST_METRICS_BUCKETS)
+
+
+def render_metrics():
+    cache_stats = recipe_response_cache.get_stats()
+    pool_stats = get_pool_stats()
+    lines = [
+        *request_metrics.render(),
+        *format_metric(
+            "foodgram_response_cache_requests_total",
+            "counter",
+            "Обращения к кэшу ответов",
+            (
+                ("", {"cache": "recipes", "result": result}, count)
+                for result, count in cache_stats.items()
+            ),
+        ),
+        *format_metric(
+            "foodgram_auth_token_cache_requests_total",
+            "counter",
+            "Обращения к кэшу токенов авторизации",
+            (
+                ("", {"result": result}, count)
+                for result, count in auth_token_cache.get_stats().items()
+            ),
+        ),
+    ]
+    for name in ("idle", "checked_out"):
+        lines.extend(
+            format_metric(
+                f"foodgram_db_pool_{name}",
+                "gauge",
+                f"Соединения пула в состоянии {name}",
+                (
+                    ("", {"alias": alias}, stats[name])
+                    for alias, stats in pool_stats.items()
+                ),
+            )
+        )
+    for name in ("created", "reused", "discarded", "waits", "timeouts"):
+        lines.extend(
+            format_metric(
+                f"foodgram_db_pool_{name}_total",
+                "counter",
+                f"Счётчик пула соединений {name}",
+                (
+                    ("", {"alias": alias}, stats[name])
+                    for alias, stats in pool_stats.items()
+                ),
+            )
+        )
+    return "\n".join(lines) + "\n"
+
+
+def get_endpoint_name(view_func, method):
+    actions = getattr(view_func, "actions", None)
+    if actions:
+        action = actions.get(method.lower(), method.lower())
+        return f"{view_func.cls.__name__}.{action}"
+    return getattr(view_func, "__name__", type(view_func).__name__)
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        if response.streaming:
+            response.streaming_content = self.observe_stream(
+                request, response, stats, response.streaming_content
+            )
+        else:
+            self.observe(request, response, stats, len(response.content))
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = stats.get_server_timing(
+                time.perf_counter() - stats.started
+            )
+        return response
+
+    def observe(self, request, response, stats, size):
+        request_metrics.observe(
+            stats,
+            request.method,
+            response.status_code,
+            time.perf_counter() - stats.started,
+            size,
+        )
+
+    def observe_stream(self, request, response, stats, chunks):
+        chunks = iter(chunks)
+        size = 0
+        try:
+            while True:
+                token = current_stats.set(stats)
+                try:
+                    chunk = next(chunks, None)
+                finally:
+                    current_stats.reset(token)
+                if chunk is None:
+                    break
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.observe(request, response, stats, size)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.endpoint = get_endpoint_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        stats = current_stats.get()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def record_render(response):
+                stats.timings["render"] += time.perf_counter() - started
+
+            response.add_post_render_callback(record_render)
+        return response
@@ -1,7 +1,203 @@
+import hashlib
+from calendar import timegm
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from rest_framework import mixins, viewsets
+from rest_framework.response import Response
+
+from api.serializers import BulkIdsSerializer
+from recipes.models import lock_users
 
 
 class ListRetrieveModelMixin(
     mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet
 ):
     pass
+
+
+class ConditionalGetMixin:
+    version_field = "updated_at"
+    cache_control = {"public": True, "max_age": 0, "must_revalidate": True}
+
+    def get_list_version(self):
+        stamp = self.queryset.aggregate(
+            count=Count("pk"), updated_at=Max(self.version_field)
+        )
+        return stamp, None
+
+    def filter_by_lookup(self, queryset):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            return queryset.none()
+
+    def get_object_version(self):
+        updated_at = (
+            self.filter_by_lookup(self.queryset)
+            .values_list(self.version_field, flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return None
+        return updated_at, timegm(updated_at.utctimetuple())
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.get_list_version(), super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            self.get_object_version(),
+            super().retrieve,
+            request,
+            *args,
+            **kwargs,
+        )
+
+    @staticmethod
+    def get_etag(*parts):
+        digest = hashlib.blake2b(repr(parts).encode(), digest_size=16)
+        return quote_etag(digest.hexdigest())
+
+    def get_conditional_response(self, version, view, request, *args, **kw):
+        if version is None:
+            return view(request, *args, **kw)
+        stamp, last_modified = version
+        etag = self.get_etag(
+            stamp, request.get_full_path(), request.accepted_renderer.format
+        )
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = view(request, *args, **kw)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, **self.cache_control)
+        return response
+
+
+class AnonymousCacheMixin:
+    response_cache = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, view, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        key = self.response_cache.make_key(request)
+        data = self.response_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.response_cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+
+class FastListMixin:
+    fast_serializer_class = None
+    fast_serializer_setting = None
+
+    def use_fast_serializer(self):
+        return self.fast_serializer_class is not None and getattr(
+            settings, self.fast_serializer_setting, False
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_serializer():
+            return super().list(request, *args, **kwargs)
+        rows = self.fast_serializer_class.get_rows(
+            self.filter_queryset(self.get_queryset())
+        )
+        context = self.get_serializer_context()
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(self.fast_serializer_class(rows, context).data)
+        return self.get_paginated_response(
+            self.fast_serializer_class(page, context).data
+        )
+
+
+class BulkRelationMixin:
+    def get_bulk_ids(self):
+        serializer = BulkIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data["ids"]
+
+    def get_user_relations(self, model, field, ids):
+        return model.objects.filter(
+            user=self.request.user, **{f"{field}_id__in": ids}
+        )
+
+    def lock_relations(self, ids):
+        lock_users([self.request.user.id])
+
+    def bulk_add(self, model, field, ids, targets, messages, validate=None):
+        self.lock_relations(ids)
+        existing = set(
+            self.get_user_relations(model, field, ids).values_list(
+                f"{field}_id", flat=True
+            )
+        )
+        results, added = [], []
+        for pk in ids:
+            if pk not in targets:
+                error = messages["not_found"]
+            elif pk in existing:
+                error = messages["exists"]
+            else:
+                error = validate(pk) if validate else None
+            if error:
+                results.append({"id": pk, "error": error})
+                continue
+            existing.add(pk)
+            added.append(pk)
+            results.append({"id": pk, "status": "added"})
+        model.objects.bulk_create(
+            [
+                model(user=self.request.user, **{f"{field}_id": pk})
+                for pk in added
+            ],
+            ignore_conflicts=True,
+        )
+        return Response({"results": results}), added
+
+    def bulk_remove(self, model, field, ids, targets, messages):
+        self.lock_relations(ids)
+        relations = self.get_user_relations(model, field, ids)
+        existing = set(relations.values_list(f"{field}_id", flat=True))
+        results, removed = [], []
+        for pk in ids:
+            if pk not in targets:
+                results.append({"id": pk, "error": messages["not_found"]})
+            elif pk not in existing:
+                results.append({"id": pk, "error": messages["missing"]})
+            else:
+                existing.discard(pk)
+                removed.append(pk)
+                results.append({"id": pk, "status": "removed"})
+        if removed:
+            self.get_user_relations(model, field, removed).delete()
+        return Response({"results": results}), removed
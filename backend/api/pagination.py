@@ -0,0 +1,43 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PageNumberOrCursorPagination(PageNumberPagination):
+    page_size_query_param = "limit"
+    max_page_size = 100
+    mode_query_param = "pagination"
+    cursor_ordering = ("-id",)
+    cursor_incompatible_params = ()
+
+    def get_cursor_paginator(self, request):
+        errors = {
+            param: "Параметр несовместим с курсорной пагинацией"
+            for param in self.cursor_incompatible_params
+            if param in request.query_params
+        }
+        if errors:
+            raise ValidationError(errors)
+        paginator = CursorPagination()
+        paginator.ordering = self.cursor_ordering
+        paginator.page_size_query_param = self.page_size_query_param
+        paginator.max_page_size = self.max_page_size
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if request.query_params.get(self.mode_query_param) == "cursor":
+            self.cursor_paginator = self.get_cursor_paginator(request)
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(PageNumberOrCursorPagination):
+    cursor_ordering = ("-pub_date", "-id")
+    cursor_incompatible_params = ("ordering", "search")
@@ -11,7 +11,7 @@ class IsAuthenticated(BasePermission):
 
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.is_admin
+        return request.user.is_authenticated and request.user.is_staff
 
 
 class IsAuthorOrReadOnly(BasePermission):
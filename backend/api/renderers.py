@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+)
+LINE_SEPARATORS = (
+    ("\u2028".encode(), b"\\u2028"),
+    ("\u2029".encode(), b"\\u2029"),
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def can_use_orjson(self, accepted_media_type, renderer_context):
+        return (
+            orjson is not None
+            and self.compact
+            and not self.ensure_ascii
+            and self.get_indent(accepted_media_type, renderer_context or {})
+            is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if not self.can_use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=ORJSON_OPTIONS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in LINE_SEPARATORS:
+            ret = ret.replace(separator, escaped)
+        return ret
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    charset = "utf-8"
+    chunk_size = 100
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, dict):
+            data = "\n".join(f"{key}: {value}" for key, value in data.items())
+        return str(data).encode(self.charset)
+
+    def stream(self, ingredients):
+        chunk = [self.header()]
+        for index, (name, unit, amount) in enumerate(ingredients, start=1):
+            chunk.append(self.row(index, name, unit, amount))
+            if len(chunk) >= self.chunk_size:
+                yield "".join(chunk)
+                chunk = []
+        chunk.append(self.footer())
+        yield "".join(chunk)
+
+    def header(self):
+        return ""
+
+    def footer(self):
+        return ""
+
+
+class ShoppingCartTextRenderer(ShoppingCartRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+    def header(self):
+        return "Список покупок:\n"
+
+    def row(self, index, name, unit, amount):
+        return f"{index}. {name} - {amount} {unit}\n"
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+    @staticmethod
+    def write_row(*values):
+        output = io.StringIO()
+        csv.writer(output).writerow(values)
+        return output.getvalue()
+
+    def header(self):
+        return self.write_row("name", "measurement_unit", "amount")
+
+    def row(self, index, name, unit, amount):
+        return self.write_row(name, unit, amount)
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    media_type = "application/json"
+    format = "json"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    def header(self):
+        return "["
+
+    def row(self, index, name, unit, amount):
+        item = json.dumps(
+            {"name": name, "measurement_unit": unit, "amount": amount},
+            ensure_ascii=False,
+        )
+        return item if index == 1 else f", {item}"
+
+    def footer(self):
+        return "]"
@@ -0,0 +1,87 @@
+import threading
+import time
+from bisect import bisect_left
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Ingredient, Recipe
+
+
+class IngredientIndex:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._keys = None
+        self._ingredients = None
+        self._built_at = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._ingredients = None
+
+    def build(self):
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (ingredient.name.upper(), ingredient.pk),
+        )
+        keys = [ingredient.name.upper() for ingredient in ingredients]
+        with self._lock:
+            self._keys = keys
+            self._ingredients = ingredients
+            self._built_at = time.monotonic()
+        return keys, ingredients
+
+    def get_entries(self):
+        with self._lock:
+            keys, ingredients = self._keys, self._ingredients
+            expired = time.monotonic() - self._built_at > self.ttl
+        if keys is None or expired:
+            return self.build()
+        return keys, ingredients
+
+    def search(self, value):
+        value = value.upper()
+        keys, ingredients = self.get_entries()
+        start = end = bisect_left(keys, value)
+        while end < len(keys) and keys[end].startswith(value):
+            end += 1
+        prefix = sorted(ingredients[start:end], key=attrgetter("pk"))
+        contains = sorted(
+            (
+                ingredient
+                for position, (key, ingredient) in enumerate(
+                    zip(keys, ingredients)
+                )
+                if not start <= position < end and value in key
+            ),
+            key=attrgetter("pk"),
+        )
+        return prefix + contains
+
+
+ingredient_index = IngredientIndex(settings.INGREDIENT_SEARCH_INDEX_TTL)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(instance, update_fields, **kwargs):
+    if update_fields and not {"name", "text"} & set(update_fields):
+        return
+    recipes = Recipe.objects.filter(pk=instance.pk)
+    transaction.on_commit(recipes.update_search_vector)
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search_vector(instance, **kwargs):
+    recipes = Recipe.objects.filter(ingredients=instance)
+    transaction.on_commit(recipes.update_search_vector)
@@ -3,14 +3,20 @@ from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
-from api.fields import Base64ImageField
+from api.fields import (Base64ImageField, BulkPrimaryKeyRelatedField,
+                        ImageVariantField)
+from api.metrics import TimedSerializerMixin
+from recipes.images import schedule_image_variants
 from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCard, Tag)
+                            RecipeIngredient, ShoppingCard,
+                            ShoppingCartIngredient, Tag, lock_recipes)
 
 User = get_user_model()
 
+BULK_IDS_MAX_LENGTH = 100
 
-class CustomUserSerializer(UserSerializer):
+
+class CustomUserSerializer(TimedSerializerMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -25,6 +31,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, "is_subscribed"):
+            return obj.is_subscribed
         request = self.context.get("request")
         return (
             request
@@ -46,13 +54,13 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ("id", "name", "color", "slug")
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ("id", "name", "measurement_unit")
@@ -60,6 +68,8 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class SubscriptionRecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_small = ImageVariantField("small")
+    image_small_webp = ImageVariantField("small_webp")
 
     class Meta:
         model = Recipe
@@ -67,11 +77,15 @@ class SubscriptionRecipeSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "image",
+            "image_small",
+            "image_small_webp",
             "cooking_time",
         )
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     email = serializers.ReadOnlyField(source="author.email")
     id = serializers.ReadOnlyField(source="author.id")
     username = serializers.ReadOnlyField(source="author.username")
@@ -108,19 +122,26 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return attrs
 
     def get_is_subscribed(self, obj):
-        return Follow.objects.filter(
-            user=self.context.get("request").user, author=obj.author
-        ).exists()
-
-    @staticmethod
-    def get_recipes(attrs):
-        all_recipes = Recipe.objects.filter(author=attrs.author)
-        return SubscriptionRecipeSerializer(all_recipes, many=True).data
+        user = self.context.get("request").user
+        if obj.user_id == user.id:
+            return True
+        return Follow.objects.filter(user=user, author=obj.author).exists()
+
+    def get_recipes(self, obj):
+        if hasattr(obj.author, "subscription_recipes"):
+            recipes = obj.author.subscription_recipes
+        else:
+            recipes = Recipe.objects.filter(author=obj.author)
+            recipes_limit = self.context.get("recipes_limit")
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        return SubscriptionRecipeSerializer(recipes, many=True).data
 
     @staticmethod
-    def get_recipes_count(attrs):
-        all_recipes = Recipe.objects.filter(author=attrs.author)
-        return all_recipes.count()
+    def get_recipes_count(obj):
+        if hasattr(obj, "recipes_count"):
+            return obj.recipes_count
+        return Recipe.objects.filter(author=obj.author).count()
 
 
 class RecipeIngredientReadSerializer(serializers.ModelSerializer):
@@ -135,7 +156,7 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = CustomUserSerializer(many=False, read_only=True)
     ingredients = RecipeIngredientReadSerializer(
@@ -143,6 +164,10 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_small = ImageVariantField("small")
+    image_small_webp = ImageVariantField("small_webp")
+    image_medium = ImageVariantField("medium")
+    image_medium_webp = ImageVariantField("medium_webp")
 
     class Meta:
         model = Recipe
@@ -153,6 +178,10 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             "ingredients",
             "name",
             "image",
+            "image_small",
+            "image_small_webp",
+            "image_medium",
+            "image_medium_webp",
             "text",
             "cooking_time",
             "is_favorited",
@@ -160,6 +189,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, "is_favorited"):
+            return recipe.is_favorited
         user = self.context["request"].user
         return (
             not user.is_anonymous
@@ -167,6 +198,8 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, "is_in_shopping_cart"):
+            return recipe.is_in_shopping_cart
         user = self.context["request"].user
         return (
             not user.is_anonymous
@@ -175,7 +208,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -183,8 +216,8 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
         fields = ("id", "amount")
 
 
-class RecipeWriteSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(
+class RecipeWriteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    tags = BulkPrimaryKeyRelatedField(
         many=True, queryset=Tag.objects.all()
     )
     ingredients = RecipeIngredientWriteSerializer(many=True)
@@ -205,33 +238,57 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
     def validate(self, attrs):
         ingredients = attrs.get("ingredients", [])
-        ingredients_id = []
-        if (
-            self.instance is None
-            and Recipe.objects.filter(name=attrs.get("name")).exists()
-        ):
+        ingredients_id = set()
+        name = attrs.get("name")
+        author = self.context["request"].user
+        recipes = Recipe.objects.filter(
+            author=author if self.instance is None else self.instance.author,
+            name=name,
+        )
+        if self.instance is not None:
+            recipes = recipes.exclude(pk=self.instance.pk)
+        if name is not None and recipes.exists():
             raise serializers.ValidationError(
                 {"name": "Название рецепта должно быть уникальным"}
             )
-        if not attrs.get("cooking_time") > 0:
+        cooking_time = attrs.get("cooking_time")
+        if cooking_time is not None and not cooking_time > 0:
             raise serializers.ValidationError(
                 {"cooking_time": "Время приготовления должно быть больше нуля"}
             )
         for elem in ingredients:
             current_id = elem.get("id")
             amount = elem.get("amount")
-            if current_id not in ingredients_id:
-                ingredients_id.append(current_id)
-            else:
+            if current_id in ingredients_id:
                 raise serializers.ValidationError(
                     {"id": "Ингредиент должен быть уникальным"}
                 )
+            ingredients_id.add(current_id)
             if not amount > 0:
                 raise serializers.ValidationError(
                     {"amount": "Количество должно быть больше нуля"}
                 )
+        self.resolve_ingredients(ingredients)
         return attrs
 
+    def resolve_ingredients(self, ingredients):
+        objects = Ingredient.objects.in_bulk(
+            [elem["id"] for elem in ingredients]
+        )
+        message = serializers.PrimaryKeyRelatedField.default_error_messages[
+            "does_not_exist"
+        ]
+        errors = [
+            {}
+            if elem["id"] in objects
+            else {"id": [message.format(pk_value=elem["id"])]}
+            for elem in ingredients
+        ]
+        if any(errors):
+            raise serializers.ValidationError({"ingredients": errors})
+        for elem in ingredients:
+            elem["id"] = objects[elem["id"]]
+
     @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop("tags")
@@ -247,43 +304,110 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             for ingredient in ingredients
         ]
         RecipeIngredient.objects.bulk_create(recipe_ingredients)
+        schedule_image_variants(recipe)
         return recipe
 
+    def update_ingredients(self, instance, ingredients):
+        lock_recipes([instance.pk])
+        old_ingredients = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=instance
+            )
+        }
+        new_amounts = {
+            ingredient.get("id").id: ingredient.get("amount")
+            for ingredient in ingredients
+        }
+        deltas = {}
+        created, changed = [], []
+        for ingredient_id, amount in new_amounts.items():
+            recipe_ingredient = old_ingredients.get(ingredient_id)
+            if recipe_ingredient is None:
+                created.append(
+                    RecipeIngredient(
+                        ingredient_id=ingredient_id,
+                        recipe=instance,
+                        amount=amount,
+                    )
+                )
+                deltas[ingredient_id] = amount
+            elif recipe_ingredient.amount != amount:
+                deltas[ingredient_id] = amount - recipe_ingredient.amount
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        removed = []
+        for ingredient_id, recipe_ingredient in old_ingredients.items():
+            if ingredient_id not in new_amounts:
+                deltas[ingredient_id] = -recipe_ingredient.amount
+                removed.append(recipe_ingredient.pk)
+        if not deltas:
+            return
+        ShoppingCartIngredient.objects.apply_deltas(
+            list(instance.shopping_card.values_list("user_id", flat=True)),
+            deltas,
+        )
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ["amount"])
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop("tags")
-        ingredients = validated_data.pop("ingredients")
-        instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
+        tags = validated_data.pop("tags", None)
+        ingredients = validated_data.pop("ingredients", None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(instance, ingredients)
+        update_fields = [*validated_data, "updated_at"]
         for field, value in validated_data.items():
             setattr(instance, field, value)
-        recipe_ingredients = [
-            RecipeIngredient(
-                ingredient=ingredient.get("id"),
-                recipe=instance,
-                amount=ingredient.get("amount"),
+        if "image" in validated_data:
+            instance.image_variants = {}
+            update_fields.append("image_variants")
+        instance.save(update_fields=update_fields)
+        if ingredients is not None and not {"name", "text"} & set(
+            validated_data
+        ):
+            transaction.on_commit(
+                Recipe.objects.filter(pk=instance.pk).update_search_vector
             )
-            for ingredient in ingredients
-        ]
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
-        instance.save()
+        if "image" in validated_data:
+            schedule_image_variants(instance)
         return instance
 
     def to_representation(self, instance):
         request = self.context.get("request")
         context = {"request": request}
+        instance = (
+            Recipe.objects.annotate_user_data(request.user.pk)
+            .prefetch_read_data(request.user.pk)
+            .get(pk=instance.pk)
+        )
         return RecipeReadSerializer(instance, context=context).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     id = serializers.ReadOnlyField(source="recipe.id")
     name = serializers.ReadOnlyField(source="recipe.name")
     image = serializers.ImageField(source="recipe.image", read_only=True)
+    image_small = ImageVariantField("small", source="recipe")
+    image_small_webp = ImageVariantField("small_webp", source="recipe")
     cooking_time = serializers.ReadOnlyField(source="recipe.cooking_time")
 
     class Meta:
         model = Favorite
-        fields = ("id", "name", "cooking_time", "image")
+        fields = (
+            "id",
+            "name",
+            "cooking_time",
+            "image",
+            "image_small",
+            "image_small_webp",
+        )
 
     def validate(self, attrs):
         user = self.context["request"].user
@@ -295,15 +419,26 @@ class FavoriteSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class ShoppingCardSerializer(serializers.ModelSerializer):
+class ShoppingCardSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer
+):
     id = serializers.ReadOnlyField(source="recipe.id")
     name = serializers.ReadOnlyField(source="recipe.name")
     image = serializers.ImageField(source="recipe.image", read_only=True)
+    image_small = ImageVariantField("small", source="recipe")
+    image_small_webp = ImageVariantField("small_webp", source="recipe")
     cooking_time = serializers.ReadOnlyField(source="recipe.cooking_time")
 
     class Meta:
         model = ShoppingCard
-        fields = ("id", "name", "cooking_time", "image")
+        fields = (
+            "id",
+            "name",
+            "cooking_time",
+            "image",
+            "image_small",
+            "image_small_webp",
+        )
 
     def validate(self, attrs):
         user = self.context["request"].user
@@ -313,3 +448,11 @@ class ShoppingCardSerializer(serializers.ModelSerializer):
                 {"error": "Рецепт уже находится в списке покупок"}
             )
         return attrs
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_IDS_MAX_LENGTH,
+    )
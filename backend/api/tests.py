@@ -0,0 +1,471 @@
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+from django.urls import path
+from rest_framework.test import APIClient
+
+from api.fast_serializers import FastRecipeReadSerializer
+from api.metrics import request_metrics
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeWriteSerializer
+from recipes.models import (Favorite, Follow, Ingredient, Recipe,
+                            RecipeIngredient, RecipeTag, ShoppingCard,
+                            ShoppingCartIngredient, Tag)
+from recipes.tests import run_concurrently
+
+User = get_user_model()
+
+RECIPE_QUERIES = 5
+
+
+def create_user(number):
+    return User.objects.create_user(
+        username=f"user{number}",
+        email=f"user{number}@example.com",
+        password="password12345",
+        first_name="Имя",
+        last_name="Фамилия",
+    )
+
+
+def create_recipes(authors, tags, ingredients, count):
+    recipes = []
+    for number in range(count):
+        recipe = Recipe.objects.create(
+            author=authors[number % len(authors)],
+            name=f"Рецепт {number}",
+            image="recipes/images/recipe.png",
+            text="Описание",
+            cooking_time=number + 1,
+        )
+        RecipeTag.objects.create(recipe=recipe, tag=tags[number % len(tags)])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[(number + shift) % len(ingredients)],
+                amount=shift + 1,
+            )
+            for shift in range(3)
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+class RecipeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(number) for number in range(3)]
+        cls.tags = [
+            Tag.objects.create(
+                name=f"Тег {number}", color="#FFFFFF", slug=f"tag{number}"
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(10)
+        ]
+        cls.recipes = create_recipes(
+            cls.users, cls.tags, cls.ingredients, 30
+        )
+        Favorite.objects.create(user=cls.users[0], recipe=cls.recipes[0])
+        ShoppingCard.objects.create(user=cls.users[0], recipe=cls.recipes[1])
+
+    def setUp(self):
+        cache.clear()
+
+    def get_client(self, user):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+
+class RecipeQueryCountTest(RecipeTestCase):
+    def assert_queries(self, path):
+        for user in (None, self.users[0]):
+            with self.subTest(path=path, user=user):
+                cache.clear()
+                client = self.get_client(user)
+                with self.assertNumQueries(RECIPE_QUERIES):
+                    response = client.get(path)
+                self.assertEqual(response.status_code, 200)
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        for limit in (6, 12, 30):
+            self.assert_queries(f"/api/recipes/?limit={limit}")
+
+    def test_detail_query_count(self):
+        self.assert_queries(f"/api/recipes/{self.recipes[0].pk}/")
+
+
+class SubscriptionTest(RecipeTestCase):
+    def test_subscription_recipe_images_are_relative(self):
+        client = self.get_client(self.users[1])
+        response = client.post(f"/api/users/{self.users[0].pk}/subscribe/")
+        self.assertEqual(response.status_code, 201)
+        response = client.get("/api/users/subscriptions/?recipes_limit=2")
+        self.assertEqual(response.status_code, 200)
+        recipes = response.data["results"][0]["recipes"]
+        self.assertEqual(len(recipes), 2)
+        for recipe in recipes:
+            for field in ("image", "image_small", "image_small_webp"):
+                self.assertTrue(recipe[field].startswith("/media/"))
+
+    def test_recipes_count_includes_recipes_created_outside_api(self):
+        author = self.users[0]
+        Recipe.objects.create(
+            author=author,
+            name="Рецепт из админки",
+            image="recipes/images/recipe.png",
+            text="Описание",
+            cooking_time=1,
+        )
+        client = self.get_client(self.users[1])
+        client.post(f"/api/users/{author.pk}/subscribe/")
+        response = client.get("/api/users/subscriptions/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["results"][0]["recipes_count"],
+            Recipe.objects.filter(author=author).count(),
+        )
+
+
+class RecipeResponseCacheTest(RecipeTestCase):
+    def get_cached(self, url):
+        client = self.get_client(None)
+        client.get(url)
+        response = client.get(url)
+        self.assertEqual(response["X-Cache"], "HIT")
+        return client
+
+    def test_author_profile_change_invalidates_cache(self):
+        recipe = self.recipes[0]
+        author = recipe.author
+        for url in ("/api/recipes/", f"/api/recipes/{recipe.pk}/"):
+            with self.subTest(url=url):
+                client = self.get_cached(url)
+                author.username = f"renamed{len(url)}"
+                with self.captureOnCommitCallbacks(execute=True):
+                    author.save()
+                response = client.get(url)
+                self.assertEqual(response["X-Cache"], "MISS")
+                self.assertIn(author.username, response.content.decode())
+
+    def test_last_login_update_keeps_cache(self):
+        client = self.get_cached("/api/recipes/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[0].save(update_fields=["last_login"])
+        self.assertEqual(client.get("/api/recipes/")["X-Cache"], "HIT")
+
+
+class RecipeConditionalGetTest(RecipeTestCase):
+    def assert_changed(self, client, path, change):
+        etag = client.get(path)["ETag"]
+        self.assertEqual(
+            client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        change()
+        response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_author_profile_change_invalidates_etag(self):
+        recipe = self.recipes[0]
+        client = self.get_client(self.users[1])
+
+        def rename():
+            recipe.author.username = "renamed"
+            recipe.author.save()
+
+        response = self.assert_changed(
+            client, f"/api/recipes/{recipe.pk}/", rename
+        )
+        self.assertEqual(response.data["author"]["username"], "renamed")
+
+    def test_follow_change_invalidates_etag(self):
+        recipe = self.recipes[0]
+        client = self.get_client(self.users[1])
+
+        def follow():
+            Follow.objects.create(user=self.users[1], author=recipe.author)
+
+        response = self.assert_changed(
+            client, f"/api/recipes/{recipe.pk}/", follow
+        )
+        self.assertTrue(response.data["author"]["is_subscribed"])
+
+
+class RecipePaginationTest(RecipeTestCase):
+    def test_ordering_is_applied_in_page_mode(self):
+        Recipe.objects.filter(pk=self.recipes[5].pk).update(favorites_count=3)
+        response = self.get_client(None).get(
+            "/api/recipes/?ordering=-favorites_count"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data["results"][0]["id"], self.recipes[5].pk
+        )
+
+    def test_search_is_ranked_in_page_mode(self):
+        Recipe.objects.filter(pk=self.recipes[3].pk).update(
+            name="Открытый пирог"
+        )
+        Recipe.objects.filter(pk=self.recipes[20].pk).update(
+            text="Тесто для пирога"
+        )
+        Recipe.objects.filter(
+            pk__in=(self.recipes[3].pk, self.recipes[20].pk)
+        ).update_search_vector()
+        response = self.get_client(None).get("/api/recipes/?search=пирог")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]],
+            [self.recipes[3].pk, self.recipes[20].pk],
+        )
+
+    def test_params_are_rejected_in_cursor_mode(self):
+        client = self.get_client(self.users[1])
+        for param, value in (("ordering", "-favorites_count"),
+                             ("search", "пирог")):
+            for url in (
+                f"/api/recipes/?pagination=cursor&{param}={value}",
+                f"/api/recipes/feed/?{param}={value}",
+            ):
+                with self.subTest(url=url):
+                    response = client.get(url)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn(param, response.data)
+
+
+class FastRecipeReadTest(RecipeTestCase):
+    def get_content(self, user, url, fast):
+        cache.clear()
+        with override_settings(FAST_RECIPE_READS=fast):
+            response = self.get_client(user).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_list_matches_model_serializer(self):
+        for user in (None, self.users[0]):
+            for url in (
+                "/api/recipes/?limit=30",
+                "/api/recipes/?page=2",
+                f"/api/recipes/?tags={self.tags[0].slug}",
+                f"/api/recipes/?author={self.users[1].pk}",
+                "/api/recipes/?ordering=-favorites_count",
+                "/api/recipes/?pagination=cursor",
+                "/api/recipes/?is_favorited=1",
+                "/api/recipes/?is_in_shopping_cart=1",
+            ):
+                with self.subTest(user=user, url=url):
+                    self.assertEqual(
+                        self.get_content(user, url, fast=True),
+                        self.get_content(user, url, fast=False),
+                    )
+
+    def test_detail_matches_model_serializer(self):
+        for user in (None, self.users[0]):
+            for recipe in self.recipes[:2]:
+                with self.subTest(user=user, recipe=recipe.pk):
+                    url = f"/api/recipes/{recipe.pk}/"
+                    request = RequestFactory().get(url)
+                    request.user = user or AnonymousUser()
+                    rows = FastRecipeReadSerializer.get_rows(
+                        Recipe.objects.annotate_user_data(
+                            request.user.id
+                        ).filter(pk=recipe.pk)
+                    )
+                    data = FastRecipeReadSerializer(
+                        rows, {"request": request}
+                    ).data
+                    self.assertEqual(
+                        FastJSONRenderer().render(data[0]),
+                        self.get_content(user, url, fast=False),
+                    )
+
+
+class RecipeUpdateTest(RecipeTestCase):
+    def test_update_keeps_concurrently_changed_fields(self):
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            favorites_count=7,
+            shopping_carts_count=3,
+            image_variants={"small": "recipes/images/recipe_small.png"},
+        )
+        request = RequestFactory().patch(f"/api/recipes/{recipe.pk}/")
+        request.user = recipe.author
+        serializer = RecipeWriteSerializer(
+            recipe,
+            data={"name": "Новое название", "cooking_time": 5},
+            partial=True,
+            context={"request": request},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, "Новое название")
+        self.assertEqual(
+            (recipe.favorites_count, recipe.shopping_carts_count), (7, 3)
+        )
+        self.assertEqual(
+            recipe.image_variants,
+            {"small": "recipes/images/recipe_small.png"},
+        )
+
+    def test_partial_update_without_cooking_time(self):
+        recipe = self.recipes[0]
+        client = self.get_client(recipe.author)
+        response = client.patch(
+            f"/api/recipes/{recipe.pk}/",
+            {"name": "Новое название"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["name"], "Новое название")
+        self.assertEqual(response.data["cooking_time"], recipe.cooking_time)
+        self.assertEqual(len(response.data["ingredients"]), 3)
+        response = client.patch(
+            f"/api/recipes/{recipe.pk}/", {"cooking_time": 0}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cooking_time", response.data)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ShoppingCartConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        self.user = create_user(0)
+        tag = Tag.objects.create(name="Тег", color="#FFFFFF", slug="tag")
+        ingredients = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            )
+            for number in range(3)
+        ]
+        self.recipes = create_recipes([self.user], [tag], ingredients, 2)
+        self.ids = [recipe.pk for recipe in self.recipes]
+
+    def get_client(self, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.user)
+        return client
+
+    def post(self, path, data=None):
+        return self.get_client().post(path, data, format="json")
+
+    def add_bulk(self):
+        response = self.post(
+            "/api/recipes/shopping_cart/bulk/", {"ids": self.ids}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def add_single(self):
+        self.post(f"/api/recipes/{self.ids[0]}/shopping_cart/")
+
+    def assert_applied_once(self):
+        self.assertEqual(
+            list(
+                Recipe.objects.filter(pk__in=self.ids).values_list(
+                    "shopping_carts_count", flat=True
+                )
+            ),
+            [1, 1],
+        )
+        self.assertEqual(
+            dict(
+                ShoppingCartIngredient.objects.filter(
+                    user=self.user
+                ).values_list("ingredient__name", "amount")
+            ),
+            {"Ингредиент 0": 4, "Ингредиент 1": 3, "Ингредиент 2": 5},
+        )
+
+    def test_concurrent_bulk_add_is_applied_once(self):
+        self.assertEqual(run_concurrently(self.add_bulk, self.add_bulk), [])
+        self.assert_applied_once()
+
+    def test_concurrent_single_and_bulk_add_is_applied_once(self):
+        self.assertEqual(
+            run_concurrently(self.add_single, self.add_bulk), []
+        )
+        self.assert_applied_once()
+
+    def test_concurrent_edit_and_add_keep_totals(self):
+        customer = create_user(1)
+        recipe = self.recipes[0]
+        ingredient = Ingredient.objects.create(
+            name="Новый ингредиент", measurement_unit="г"
+        )
+
+        def edit():
+            response = self.get_client().patch(
+                f"/api/recipes/{recipe.pk}/",
+                {"ingredients": [{"id": ingredient.pk, "amount": 10}]},
+                format="json",
+            )
+            self.assertEqual(response.status_code, 200)
+
+        def add():
+            response = self.get_client(customer).post(
+                f"/api/recipes/{recipe.pk}/shopping_cart/"
+            )
+            self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(run_concurrently(edit, add), [])
+        self.assertEqual(
+            dict(
+                ShoppingCartIngredient.objects.filter(
+                    user=customer
+                ).values_list("ingredient__name", "amount")
+            ),
+            {"Новый ингредиент": 10},
+        )
+
+
+async def wait_for_concurrent_requests(request):
+    test = AsyncRequestMetricsTest
+    test.arrived += 1
+    if test.arrived == test.concurrency:
+        test.all_arrived.set()
+    try:
+        await asyncio.wait_for(test.all_arrived.wait(), timeout=1)
+    except asyncio.TimeoutError:
+        return HttpResponse(status=504)
+    return HttpResponse()
+
+
+urlpatterns = [path("concurrent/", wait_for_concurrent_requests)]
+
+
+@override_settings(ROOT_URLCONF=__name__, SERVER_TIMING=True)
+class AsyncRequestMetricsTest(SimpleTestCase):
+    concurrency = 4
+
+    async def get_concurrently(self):
+        AsyncRequestMetricsTest.arrived = 0
+        AsyncRequestMetricsTest.all_arrived = asyncio.Event()
+        return await asyncio.gather(
+            *(
+                self.async_client.get("/concurrent/")
+                for _ in range(self.concurrency)
+            )
+        )
+
+    def test_concurrent_requests_overlap(self):
+        responses = asyncio.run(self.get_concurrently())
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("Server-Timing", response)
+        self.assertIn(
+            ("wait_for_concurrent_requests", "GET"),
+            request_metrics.endpoints,
+        )
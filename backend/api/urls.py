@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.async_views import make_async_routes
 from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
+                       TagViewSet, db_pool_stats, metrics)
 
 router = DefaultRouter()
 router.register("users", CustomUserViewSet, basename="users")
@@ -10,7 +12,13 @@ router.register("tags", TagViewSet, basename="tags")
 router.register("ingredients", IngredientViewSet, basename="ingredients")
 router.register("recipes", RecipeViewSet, basename="recipes")
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    router_urls = make_async_routes(router_urls)
+
 urlpatterns = [
     path("auth/", include("djoser.urls.authtoken")),
-    path("", include(router.urls)),
+    path("db-pool/", db_pool_stats, name="db-pool"),
+    path("metrics/", metrics, name="metrics"),
+    path("", include(router_urls)),
 ]
@@ -1,31 +1,85 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 
+from api.cache import recipe_response_cache
+from api.fast_serializers import FastRecipeReadSerializer
 from api.filters import IngredientFilter, RecipeFilter
-from api.mixins import ListRetrieveModelMixin
-from api.permissions import IsAuthenticated, IsAuthorOrReadOnly
+from api.metrics import render_metrics
+from api.mixins import (AnonymousCacheMixin, BulkRelationMixin,
+                        ConditionalGetMixin, FastListMixin,
+                        ListRetrieveModelMixin)
+from api.pagination import PageNumberOrCursorPagination, RecipePagination
+from api.permissions import IsAdmin, IsAuthenticated, IsAuthorOrReadOnly
+from api.renderers import (ShoppingCartCSVRenderer, ShoppingCartJSONRenderer,
+                           ShoppingCartTextRenderer)
+from api.search import ingredient_index
 from api.serializers import (CustomUserCreateSerializer, CustomUserSerializer,
                              FavoriteSerializer, IngredientSerializer,
                              RecipeReadSerializer, RecipeWriteSerializer,
                              ShoppingCardSerializer, SubscriptionSerializer,
                              TagSerializer)
-from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCard, Tag)
+from foodgram.db.base import get_pool_stats
+from recipes.counters import update_counter
+from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingCard,
+                            ShoppingCartIngredient, Tag, lock_recipes,
+                            lock_users)
 
 User = get_user_model()
 
+SHOPPING_CART_CHUNK_SIZE = 500
+
+SUBSCRIPTION_MESSAGES = {
+    "not_found": "Пользователь не найден",
+    "exists": "Вы уже подписаны на этого автора",
+    "missing": "Вы не подписаны на данного пользователя",
+}
+SHOPPING_CART_MESSAGES = {
+    "not_found": "Рецепт не найден",
+    "exists": "Рецепт уже находится в списке покупок",
+    "missing": "У вас не было этого рецепта в списке покупок",
+}
+FAVORITE_MESSAGES = {
+    "not_found": "Рецепт не найден",
+    "exists": "Рецепт уже находится в избранном",
+    "missing": "У вас не было этого рецепта в списке избранных",
+}
+
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(BulkRelationMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     http_method_names = ["get", "post", "delete"]
+    pagination_class = PageNumberOrCursorPagination
+
+    def get_queryset(self):
+        user_id = (
+            self.request.user.id
+            if self.request.user.is_authenticated
+            else None
+        )
+        return User.objects.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(user_id=user_id, author=OuterRef("pk"))
+            )
+        )
+
+    def get_recipes_limit(self):
+        try:
+            recipes_limit = int(self.request.query_params["recipes_limit"])
+        except (KeyError, ValueError):
+            return None
+        return max(recipes_limit, 0)
 
     @action(
         detail=False, methods=["GET"], permission_classes=[IsAuthenticated]
@@ -55,31 +109,46 @@ class CustomUserViewSet(viewsets.ModelViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        subscriptions = Follow.objects.filter(user=user)
-        pages = self.paginate_queryset(subscriptions)
-        serializer = SubscriptionSerializer(
-            pages, many=True, context={"request": request}
+        recipes_limit = self.get_recipes_limit()
+        subscriptions = (
+            Follow.objects.filter(user=user)
+            .with_author_data(recipes_limit)
+            .order_by("-id")
         )
+        pages = self.paginate_queryset(subscriptions)
+        context = {"request": request, "recipes_limit": recipes_limit}
+        serializer = SubscriptionSerializer(pages, many=True, context=context)
         return self.get_paginated_response(serializer.data)
 
     @action(
         detail=True, methods=["POST"], permission_classes=[IsAuthenticated]
     )
+    @transaction.atomic
     def subscribe(self, request, **kwargs):
         user = get_object_or_404(User, pk=kwargs.get("pk"))
-        context = {"request": self.request, "user": user}
+        lock_users([request.user.id, user.pk])
+        context = {
+            "request": self.request,
+            "author": user,
+            "recipes_limit": self.get_recipes_limit(),
+        }
         serializer = SubscriptionSerializer(data=request.data, context=context)
         if serializer.is_valid(raise_exception=True):
             serializer.save(user=request.user, author=user)
+            update_counter(
+                User.objects.filter(pk=user.pk), "followers_count", 1
+            )
             return Response(
                 data=serializer.data, status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def unsubscribe(self, request, **kwargs):
         user = request.user
         author = get_object_or_404(User, pk=kwargs.get("pk"))
+        lock_users([user.id, author.pk])
         if not Follow.objects.filter(user=user, author=author).exists():
             return Response(
                 {"error": "Вы не подписаны на данного пользователя"},
@@ -87,29 +156,138 @@ class CustomUserViewSet(viewsets.ModelViewSet):
             )
         follow = get_object_or_404(Follow, user=user, author=author)
         follow.delete()
+        update_counter(
+            User.objects.filter(pk=author.pk), "followers_count", -1
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def lock_relations(self, ids):
+        lock_users([self.request.user.id, *ids])
+
+    def get_existing_user_ids(self, ids):
+        return set(
+            User.objects.filter(pk__in=ids).values_list("pk", flat=True)
+        )
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        url_path="subscribe/bulk",
+    )
+    @transaction.atomic
+    def bulk_subscribe(self, request):
+        ids = self.get_bulk_ids()
+        response, added = self.bulk_add(
+            Follow,
+            "author",
+            ids,
+            self.get_existing_user_ids(ids),
+            SUBSCRIPTION_MESSAGES,
+            validate=lambda pk: (
+                "Нельзя подписаться на себя" if pk == request.user.id else None
+            ),
+        )
+        update_counter(
+            User.objects.filter(pk__in=added), "followers_count", 1
+        )
+        return response
+
+    @bulk_subscribe.mapping.delete
+    @transaction.atomic
+    def bulk_unsubscribe(self, request):
+        ids = self.get_bulk_ids()
+        response, removed = self.bulk_remove(
+            Follow,
+            "author",
+            ids,
+            self.get_existing_user_ids(ids),
+            SUBSCRIPTION_MESSAGES,
+        )
+        update_counter(
+            User.objects.filter(pk__in=removed), "followers_count", -1
+        )
+        return response
+
 
-class TagViewSet(ListRetrieveModelMixin):
+class TagViewSet(ConditionalGetMixin, ListRetrieveModelMixin):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class IngredientViewSet(ListRetrieveModelMixin):
+class IngredientViewSet(ConditionalGetMixin, ListRetrieveModelMixin):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filterset_class = IngredientFilter
     filter_backends = (DjangoFilterBackend,)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name", "").strip()
+        if not (settings.INGREDIENT_SEARCH_INDEX and name):
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer(
+            ingredient_index.search(name), many=True
+        )
+        return Response(serializer.data)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,
+    AnonymousCacheMixin,
+    BulkRelationMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
     http_method_names = ["get", "post", "patch", "delete"]
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrReadOnly]
     filterset_class = RecipeFilter
     filter_backends = (DjangoFilterBackend,)
+    pagination_class = RecipePagination
+    cache_control = {"private": True, "no_cache": True}
+    response_cache = recipe_response_cache
+    fast_serializer_class = FastRecipeReadSerializer
+    fast_serializer_setting = "FAST_RECIPE_READS"
+
+    def get_list_version(self):
+        return None
+
+    def get_object_version(self):
+        user_id = (
+            self.request.user.id
+            if self.request.user.is_authenticated
+            else None
+        )
+        stamp = (
+            self.filter_by_lookup(Recipe.objects.annotate_user_data(user_id))
+            .annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(
+                        user_id=user_id, author=OuterRef("author")
+                    )
+                ),
+                tags_updated_at=Max("tags__updated_at"),
+                ingredients_updated_at=Max("ingredients__updated_at"),
+            )
+            .values_list(
+                "updated_at",
+                "is_favorited",
+                "is_in_shopping_cart",
+                "is_subscribed",
+                "tags_updated_at",
+                "ingredients_updated_at",
+                "author__email",
+                "author__username",
+                "author__first_name",
+                "author__last_name",
+            )
+            .first()
+        )
+        if stamp is None:
+            return None
+        return (user_id, stamp), None
 
     def get_queryset(self):
         user_id = (
@@ -117,15 +295,34 @@ class RecipeViewSet(viewsets.ModelViewSet):
             if self.request.user.is_authenticated
             else None
         )
-        return Recipe.objects.annotate_user_data(user_id)
+        return Recipe.objects.annotate_user_data(user_id).prefetch_read_data(
+            user_id
+        )
 
     def get_serializer_class(self):
         if self.action in ["create", "partial_update"]:
             return RecipeWriteSerializer
         return RecipeReadSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        update_counter(
+            User.objects.filter(pk=self.request.user.pk), "recipes_count", 1
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        lock_recipes([instance.pk])
+        ShoppingCartIngredient.objects.apply_recipe(
+            list(instance.shopping_card.values_list("user_id", flat=True)),
+            instance,
+            sign=-1,
+        )
+        instance.delete()
+        update_counter(
+            User.objects.filter(pk=instance.author_id), "recipes_count", -1
+        )
 
     @action(
         detail=True,
@@ -133,21 +330,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated],
         url_path="shopping_cart",
     )
+    @transaction.atomic
     def add_to_shopping_cart(self, request, **kwargs):
         recipe = self.get_object()
+        lock_recipes([recipe.pk])
+        lock_users([request.user.id])
         context = {"request": request, "recipe": recipe}
         serializer = ShoppingCardSerializer(data=request.data, context=context)
         if serializer.is_valid(raise_exception=True):
             serializer.save(user=request.user, recipe=recipe)
+            ShoppingCartIngredient.objects.apply_recipe(
+                [request.user.id], recipe
+            )
+            update_counter(
+                Recipe.objects.filter(pk=recipe.pk), "shopping_carts_count", 1
+            )
             return Response(
                 data=serializer.data, status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @add_to_shopping_cart.mapping.delete
+    @transaction.atomic
     def remove_from_shopping_cart(self, request, **kwargs):
         recipe = self.get_object()
         user = request.user
+        lock_recipes([recipe.pk])
+        lock_users([user.id])
         if not ShoppingCard.objects.filter(user=user, recipe=recipe).exists():
             return Response(
                 {"error": "У вас не было этого рецепта в списке покупок"},
@@ -157,6 +366,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ShoppingCard, user=user, recipe=recipe
         )
         shopping_card.delete()
+        ShoppingCartIngredient.objects.apply_recipe([user.id], recipe, sign=-1)
+        update_counter(
+            Recipe.objects.filter(pk=recipe.pk), "shopping_carts_count", -1
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -165,21 +378,30 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=[IsAuthenticated],
         url_path="favorite",
     )
+    @transaction.atomic
     def add_to_favorite(self, request, **kwargs):
         recipe = self.get_object()
+        lock_recipes([recipe.pk])
+        lock_users([request.user.id])
         context = {"request": request, "recipe": recipe}
         serializer = FavoriteSerializer(data=request.data, context=context)
         if serializer.is_valid(raise_exception=True):
             serializer.save(user=request.user, recipe=recipe)
+            update_counter(
+                Recipe.objects.filter(pk=recipe.pk), "favorites_count", 1
+            )
             return Response(
                 data=serializer.data, status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @add_to_favorite.mapping.delete
+    @transaction.atomic
     def remove_from_favorite(self, request, **kwargs):
         recipe = self.get_object()
         user = request.user
+        lock_recipes([recipe.pk])
+        lock_users([user.id])
         if not Favorite.objects.filter(user=user, recipe=recipe).exists():
             return Response(
                 {"error": "У вас не было этого рецепта в списке избранных"},
@@ -187,24 +409,149 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         favorite_recipe = get_object_or_404(Favorite, user=user, recipe=recipe)
         favorite_recipe.delete()
+        update_counter(
+            Recipe.objects.filter(pk=recipe.pk), "favorites_count", -1
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def lock_relations(self, ids):
+        lock_recipes(ids)
+        super().lock_relations(ids)
+
+    def get_existing_recipe_ids(self, ids):
+        return set(
+            Recipe.objects.filter(pk__in=ids).values_list("pk", flat=True)
+        )
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        url_path="shopping_cart/bulk",
+    )
+    @transaction.atomic
+    def bulk_add_to_shopping_cart(self, request):
+        ids = self.get_bulk_ids()
+        response, added = self.bulk_add(
+            ShoppingCard,
+            "recipe",
+            ids,
+            self.get_existing_recipe_ids(ids),
+            SHOPPING_CART_MESSAGES,
+        )
+        ShoppingCartIngredient.objects.apply_recipes([request.user.id], added)
+        update_counter(
+            Recipe.objects.filter(pk__in=added), "shopping_carts_count", 1
+        )
+        return response
+
+    @bulk_add_to_shopping_cart.mapping.delete
+    @transaction.atomic
+    def bulk_remove_from_shopping_cart(self, request):
+        ids = self.get_bulk_ids()
+        response, removed = self.bulk_remove(
+            ShoppingCard,
+            "recipe",
+            ids,
+            self.get_existing_recipe_ids(ids),
+            SHOPPING_CART_MESSAGES,
+        )
+        ShoppingCartIngredient.objects.apply_recipes(
+            [request.user.id], removed, sign=-1
+        )
+        update_counter(
+            Recipe.objects.filter(pk__in=removed), "shopping_carts_count", -1
+        )
+        return response
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        permission_classes=[IsAuthenticated],
+        url_path="favorite/bulk",
+    )
+    @transaction.atomic
+    def bulk_add_to_favorite(self, request):
+        ids = self.get_bulk_ids()
+        response, added = self.bulk_add(
+            Favorite,
+            "recipe",
+            ids,
+            self.get_existing_recipe_ids(ids),
+            FAVORITE_MESSAGES,
+        )
+        update_counter(
+            Recipe.objects.filter(pk__in=added), "favorites_count", 1
+        )
+        return response
+
+    @bulk_add_to_favorite.mapping.delete
+    @transaction.atomic
+    def bulk_remove_from_favorite(self, request):
+        ids = self.get_bulk_ids()
+        response, removed = self.bulk_remove(
+            Favorite,
+            "recipe",
+            ids,
+            self.get_existing_recipe_ids(ids),
+            FAVORITE_MESSAGES,
+        )
+        update_counter(
+            Recipe.objects.filter(pk__in=removed), "favorites_count", -1
+        )
+        return response
+
     @action(
         detail=False, methods=["GET"], permission_classes=[IsAuthenticated]
     )
+    def feed(self, request):
+        recipes = self.filter_queryset(
+            self.get_queryset().followed_by(request.user.id)
+        )
+        paginator = self.paginator.get_cursor_paginator(request)
+        page = paginator.paginate_queryset(recipes, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            ShoppingCartTextRenderer,
+            ShoppingCartCSVRenderer,
+            ShoppingCartJSONRenderer,
+        ],
+    )
     def download_shopping_cart(self, request):
         ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shopping_card__user=request.user
+            ShoppingCartIngredient.objects.filter(user=request.user)
+            .values_list(
+                "ingredient__name", "ingredient__measurement_unit", "amount"
             )
-            .prefetch_related("recipe__shopping_card", "user", "ingredient")
-            .values_list("ingredient__name", "ingredient__measurement_unit")
-            .annotate(total_amount=Sum("amount"))
-        )
-        output = ["Список покупок:\n"]
-        for i, (name, unit, amount) in enumerate(ingredients, start=1):
-            output.append(f"{i}. {name} - {amount} {unit}\n")
-        response = HttpResponse(content_type="text/plain")
-        response["Content-Disposition"] = 'attachment; filename="recipes.txt"'
-        response.write("".join(output))
+            .order_by("ingredient__name")
+            .iterator(chunk_size=SHOPPING_CART_CHUNK_SIZE)
+        )
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients),
+            content_type=f"{renderer.media_type}; charset={renderer.charset}",
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="recipes.{renderer.format}"'
+        )
         return response
+
+
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def db_pool_stats(request):
+    return Response({"pid": os.getpid(), "pools": get_pool_stats()})
+
+
+@api_view(["GET"])
+@permission_classes([IsAdmin])
+def metrics(request):
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,80 @@
+import threading
+
+from django.db.backends.postgresql import base
+
+from foodgram.db.pool import ConnectionPool
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool_stats():
+    with pools_lock:
+        return {alias: pool.get_stats() for alias, pool in pools.items()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_done = False
+    connection_reused = False
+
+    def get_pool(self):
+        options = self.settings_dict.get("POOL")
+        if not options:
+            return None
+        with pools_lock:
+            if self.alias not in pools:
+                pools[self.alias] = ConnectionPool(
+                    size=options["SIZE"],
+                    max_overflow=options.get("MAX_OVERFLOW", 0),
+                    timeout=options.get("TIMEOUT", 10),
+                    recycle=options.get("RECYCLE"),
+                )
+            return pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool()
+        if pool is None:
+            self.connection_reused = False
+            return super().get_new_connection(conn_params)
+        created = []
+
+        def connect():
+            created.append(True)
+            return super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+
+        connection = pool.acquire(connect)
+        self.connection_reused = not created
+        if self.connection_reused:
+            self.isolation_level = self.settings_dict["OPTIONS"].get(
+                "isolation_level", connection.isolation_level
+            )
+        return connection
+
+    def _close(self):
+        pool = self.get_pool()
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            return pool.release(self.connection)
+
+    def connect(self):
+        self.health_check_done = True
+        super().connect()
+        self.health_check_done = not self.connection_reused
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and self.settings_dict.get("CONN_HEALTH_CHECKS")
+        ):
+            self.health_check_done = True
+            if not self.in_atomic_block and not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
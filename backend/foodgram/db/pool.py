@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import deque
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, size, max_overflow=0, timeout=10, recycle=None):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._condition = threading.Condition()
+        self._idle = deque()
+        self._created_at = {}
+        self._checked_out = 0
+        self.counters = dict.fromkeys(
+            ("created", "reused", "discarded", "waits", "timeouts"), 0
+        )
+
+    def is_expired(self, connection):
+        return bool(
+            self.recycle
+            and time.monotonic() - self._created_at[connection] > self.recycle
+        )
+
+    def discard(self, connection):
+        self._created_at.pop(connection, None)
+        self.counters["discarded"] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self, connect):
+        deadline = time.monotonic() + self.timeout
+        with self._condition:
+            while True:
+                while self._idle:
+                    connection = self._idle.pop()
+                    if connection.closed or self.is_expired(connection):
+                        self.discard(connection)
+                        continue
+                    self._checked_out += 1
+                    self.counters["reused"] += 1
+                    return connection
+                if self._checked_out < self.size + self.max_overflow:
+                    self._checked_out += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        "Не удалось получить соединение с базой данных за "
+                        f"{self.timeout} с"
+                    )
+                self.counters["waits"] += 1
+                self._condition.wait(remaining)
+        try:
+            connection = connect()
+        except Exception:
+            with self._condition:
+                self._checked_out -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._created_at[connection] = time.monotonic()
+            self.counters["created"] += 1
+        return connection
+
+    def release(self, connection):
+        if not connection.closed:
+            try:
+                status = connection.get_transaction_status()
+                if status != TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except Exception:
+                connection.close()
+        with self._condition:
+            self._checked_out -= 1
+            if (
+                connection.closed
+                or self.is_expired(connection)
+                or len(self._idle) + self._checked_out >= self.size
+            ):
+                self.discard(connection)
+            else:
+                self._idle.append(connection)
+            self._condition.notify()
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                **self.counters,
+            }
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -74,14 +75,33 @@ WSGI_APPLICATION = "foodgram.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+DB_ENGINE = os.getenv("DB_ENGINE", "django.db.backends.postgresql")
+if DB_ENGINE == "django.db.backends.postgresql":
+    DB_ENGINE = "foodgram.db"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
+
 DATABASES = {
     "default": {
-        "ENGINE": os.getenv("DB_ENGINE", "django.db.backends.postgresql"),
+        "ENGINE": DB_ENGINE,
         "NAME": os.getenv("DB_NAME", "postgres"),
         "USER": os.getenv("POSTGRES_USER", "postgres"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "postgres"),
         "HOST": os.getenv("DB_HOST", "localhost"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        "CONN_MAX_AGE": (
+            0 if DB_POOL_SIZE else int(os.getenv("DB_CONN_MAX_AGE", "60"))
+        ),
+        "CONN_HEALTH_CHECKS": (
+            os.getenv("DB_CONN_HEALTH_CHECKS", "True").lower() == "true"
+        ),
+        "POOL": {
+            "SIZE": DB_POOL_SIZE,
+            "MAX_OVERFLOW": int(os.getenv("DB_POOL_MAX_OVERFLOW", "5")),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "RECYCLE": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        }
+        if DB_POOL_SIZE
+        else None,
     }
 }
 
@@ -149,7 +169,16 @@ DJOSER = {
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
+    ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",
@@ -175,8 +204,66 @@ CORS_ALLOW_METHODS = [
 ]
 # endregion
 
+# region cache
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
+RECIPE_CACHE_TIMEOUT = int(os.getenv("RECIPE_CACHE_TIMEOUT", "60"))
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv("AUTH_TOKEN_CACHE_TIMEOUT", "30"))
+# endregion
+
+# region ingredient search index
+INGREDIENT_SEARCH_INDEX = (
+    os.getenv("INGREDIENT_SEARCH_INDEX", "False").lower() == "true"
+)
+INGREDIENT_SEARCH_INDEX_TTL = int(
+    os.getenv("INGREDIENT_SEARCH_INDEX_TTL", "300")
+)
+# endregion
+
+# region fast reads
+FAST_RECIPE_READS = (
+    os.getenv("FAST_RECIPE_READS", "False").lower() == "true"
+)
+# endregion
+
+# region recipe search
+RECIPE_SEARCH_CONFIG = os.getenv("RECIPE_SEARCH_CONFIG", "russian")
+# endregion
+
+# region recipe image variants
+RECIPE_IMAGE_VARIANTS = {"small": 320, "medium": 960}
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+# endregion
+
 # region data upload
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10240
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.getenv("IMAGE_UPLOAD_MAX_BYTES", str(2 * 1024 * 1024))
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv("IMAGE_UPLOAD_MAX_PIXELS", str(25_000_000))
+)
+# endregion
+
+# region asgi
+SERVER_INTERFACE = os.getenv("SERVER_INTERFACE", "wsgi").lower()
+ASYNC_READ_VIEWS = (
+    os.getenv("ASYNC_READ_VIEWS", str(SERVER_INTERFACE == "asgi")).lower()
+    == "true"
+)
+# endregion
+
+# region metrics
+SERVER_TIMING = os.getenv("SERVER_TIMING", "True").lower() == "true"
+REQUEST_METRICS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
 # endregion
 
 # region drf-spectacular
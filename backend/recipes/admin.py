@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 from recipes.models import (Favorite, Follow, Ingredient, Recipe,
-                            RecipeIngredient, RecipeTag, ShoppingCard, Tag)
+                            RecipeIngredient, RecipeTag, ShoppingCard,
+                            ShoppingCartIngredient, Tag)
 
 
 class RecipeIngredientLine(admin.TabularInline):
@@ -17,7 +18,7 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
     def favorites(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
     favorites.short_description = "Добавлений в избранное"
 
@@ -35,3 +36,4 @@ admin.site.register(Tag)
 admin.site.register(RecipeTag)
 admin.site.register(RecipeIngredient)
 admin.site.register(ShoppingCard)
+admin.site.register(ShoppingCartIngredient)
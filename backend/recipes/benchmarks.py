@@ -0,0 +1,480 @@
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.wsgi import get_wsgi_application
+from django.db import connections, transaction
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Follow, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCard, Tag)
+
+User = get_user_model()
+
+LOAD_TEST_PREFIX = "loadtest_"
+LOAD_TEST_MIX = {
+    "browse": 25,
+    "tag_filter": 15,
+    "auth_list": 15,
+    "subscribe": 10,
+    "cart": 15,
+    "download": 5,
+    "autocomplete": 15,
+}
+LOAD_TEST_PERCENTILES = (50, 95, 99)
+
+LoadRequest = namedtuple(
+    "LoadRequest",
+    ("name", "method", "path", "token", "on_success"),
+    defaults=(None, None),
+)
+
+
+def fetch(url, headers, timeout, method="GET"):
+    request = urllib.request.Request(
+        urllib.parse.quote(url, safe=":/?&=%+"),
+        headers=headers,
+        method=method,
+        data=b"" if method in ("POST", "PUT", "PATCH") else None,
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status < 400
+    except OSError:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def summarize(results, elapsed, percents=(50, 90, 99)):
+    latencies = sorted(latency for latency, ok in results if ok)
+    summary = {
+        "requests": len(results),
+        "errors": len(results) - len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(results) / elapsed, 1) if elapsed else None,
+    }
+    for percent in percents:
+        value = percentile(latencies, percent)
+        summary[f"p{percent}_ms"] = (
+            None if value is None else round(value * 1000, 2)
+        )
+    summary["max_ms"] = (
+        round(latencies[-1] * 1000, 2) if latencies else None
+    )
+    return summary
+
+
+def measure(function, iterations, warmup=0, percents=(50, 90, 99)):
+    for _ in range(warmup):
+        function()
+    results = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        function()
+        results.append((time.perf_counter() - call_started, True))
+    return summarize(results, time.perf_counter() - started, percents)
+
+
+def run_load(urls, total, concurrency, headers=None, timeout=30):
+    headers = headers or {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        results = list(
+            executor.map(
+                lambda number: fetch(
+                    urls[number % len(urls)], headers, timeout
+                ),
+                range(total),
+            )
+        )
+        elapsed = time.perf_counter() - started
+    return summarize(results, elapsed)
+
+
+def wait_until_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if fetch(url, {}, timeout=1)[1]:
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def start_gunicorn(interface, workers, port):
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--config",
+            str(settings.BASE_DIR / "gunicorn.conf.py"),
+            "--bind",
+            f"127.0.0.1:{port}",
+        ],
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ,
+            "SERVER_INTERFACE": interface,
+            "GUNICORN_WORKERS": str(workers),
+        },
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+class VirtualUser:
+    def __init__(self, pk, token):
+        self.pk = pk
+        self.token = token
+        self.subscriptions = set()
+        self.cart = set()
+
+
+class LoadDataset:
+    def __init__(self, users, recipe_ids, tag_slugs, prefixes):
+        self.users = users
+        self.user_ids = [user.pk for user in users]
+        self.recipe_ids = recipe_ids
+        self.tag_slugs = tag_slugs
+        self.prefixes = prefixes
+        self.pages = max(
+            math.ceil(
+                len(recipe_ids) / settings.REST_FRAMEWORK["PAGE_SIZE"]
+            ),
+            1,
+        )
+
+
+def get_or_create_catalog(model, count, make):
+    objects = list(model.objects.all()[:count])
+    if len(objects) >= count:
+        return objects
+    model.objects.bulk_create(
+        [make(number) for number in range(len(objects), count)],
+        ignore_conflicts=True,
+    )
+    return list(model.objects.all()[:count])
+
+
+def seed_load_dataset(users=50, recipes=500, ingredients=5, seed=0):
+    rng = random.Random(seed)
+    tags = get_or_create_catalog(
+        Tag,
+        3,
+        lambda number: Tag(
+            name=f"{LOAD_TEST_PREFIX}{number}",
+            color=f"#{rng.randrange(0x1000000):06x}",
+            slug=f"{LOAD_TEST_PREFIX}{number}",
+        ),
+    )
+    catalog = get_or_create_catalog(
+        Ingredient,
+        max(ingredients * 10, 50),
+        lambda number: Ingredient(
+            name=f"{LOAD_TEST_PREFIX}ингредиент {number}",
+            measurement_unit="г",
+        ),
+    )
+    authors = [rng.randrange(users) for _ in range(recipes)]
+    recipes_count = Counter(authors)
+    password = make_password(None)
+    with transaction.atomic():
+        User.objects.filter(username__startswith=LOAD_TEST_PREFIX).delete()
+        User.objects.bulk_create(
+            User(
+                username=f"{LOAD_TEST_PREFIX}{number}",
+                email=f"{LOAD_TEST_PREFIX}{number}@example.com",
+                first_name="Нагрузка",
+                last_name=str(number),
+                password=password,
+                recipes_count=recipes_count[number],
+            )
+            for number in range(users)
+        )
+        user_ids = dict(
+            User.objects.filter(
+                username__startswith=LOAD_TEST_PREFIX
+            ).values_list("username", "pk")
+        )
+        author_ids = [
+            user_ids[f"{LOAD_TEST_PREFIX}{number}"] for number in range(users)
+        ]
+        Token.objects.bulk_create(
+            Token(key=Token.generate_key(), user_id=pk) for pk in author_ids
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author_id=author_ids[author],
+                name=f"Рецепт нагрузки {number}",
+                image="recipes/images/loadtest.png",
+                text=f"Описание рецепта нагрузки {number}",
+                cooking_time=rng.randint(1, 120),
+            )
+            for number, author in enumerate(authors)
+        )
+        recipes = Recipe.objects.filter(
+            author__username__startswith=LOAD_TEST_PREFIX
+        )
+        recipe_ids = list(recipes.values_list("pk", flat=True))
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe_id=recipe_id, tag=tag)
+            for recipe_id in recipe_ids
+            for tag in rng.sample(tags, rng.randint(1, len(tags)))
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient=ingredient,
+                amount=rng.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient in rng.sample(
+                catalog, min(ingredients, len(catalog))
+            )
+        )
+        recipes.update_search_vector()
+
+
+def load_dataset():
+    users = {
+        user_id: VirtualUser(user_id, key)
+        for key, user_id in Token.objects.filter(
+            user__username__startswith=LOAD_TEST_PREFIX
+        ).values_list("key", "user_id")
+    }
+    for user_id, author_id in Follow.objects.filter(
+        user_id__in=users
+    ).values_list("user_id", "author_id"):
+        users[user_id].subscriptions.add(author_id)
+    for user_id, recipe_id in ShoppingCard.objects.filter(
+        user_id__in=users
+    ).values_list("user_id", "recipe_id"):
+        users[user_id].cart.add(recipe_id)
+    recipe_ids = list(
+        Recipe.objects.filter(author_id__in=users)
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    tag_slugs = list(
+        Tag.objects.filter(
+            recipe_tags__recipe__author__username__startswith=(
+                LOAD_TEST_PREFIX
+            )
+        )
+        .distinct()
+        .values_list("slug", flat=True)
+    )
+    prefixes = {
+        name[:2].lower()
+        for name in Ingredient.objects.values_list("name", flat=True)[:500]
+    }
+    return LoadDataset(
+        list(users.values()), recipe_ids, tag_slugs, sorted(prefixes)
+    )
+
+
+class TrafficMix:
+    def __init__(self, dataset, rng, weights=None):
+        weights = weights or LOAD_TEST_MIX
+        self.dataset = dataset
+        self.rng = rng
+        self.scenarios = list(weights)
+        self.weights = list(weights.values())
+
+    def next_request(self, user):
+        scenario = self.rng.choices(self.scenarios, self.weights)[0]
+        return getattr(self, scenario)(user)
+
+    def get_page(self):
+        return min(int(self.rng.expovariate(0.5)) + 1, self.dataset.pages)
+
+    def browse(self, user):
+        return LoadRequest(
+            "browse", "GET", f"/api/recipes/?page={self.get_page()}"
+        )
+
+    def tag_filter(self, user):
+        slugs = self.rng.sample(
+            self.dataset.tag_slugs, min(2, len(self.dataset.tag_slugs))
+        )
+        query = urllib.parse.urlencode([("tags", slug) for slug in slugs])
+        return LoadRequest("tag_filter", "GET", f"/api/recipes/?{query}")
+
+    def auth_list(self, user):
+        query = self.rng.choice(
+            (
+                f"page={self.get_page()}",
+                "is_favorited=1",
+                "is_in_shopping_cart=1",
+            )
+        )
+        return LoadRequest(
+            "auth_list", "GET", f"/api/recipes/?{query}", user.token
+        )
+
+    def subscribe(self, user):
+        author_id = self.rng.choice(self.dataset.user_ids)
+        if author_id == user.pk:
+            return self.browse(user)
+        path = f"/api/users/{author_id}/subscribe/"
+        if author_id in user.subscriptions:
+            return LoadRequest(
+                "unsubscribe",
+                "DELETE",
+                path,
+                user.token,
+                lambda: user.subscriptions.discard(author_id),
+            )
+        return LoadRequest(
+            "subscribe",
+            "POST",
+            path,
+            user.token,
+            lambda: user.subscriptions.add(author_id),
+        )
+
+    def cart(self, user):
+        recipe_id = self.rng.choice(self.dataset.recipe_ids)
+        path = f"/api/recipes/{recipe_id}/shopping_cart/"
+        if recipe_id in user.cart:
+            return LoadRequest(
+                "cart_remove",
+                "DELETE",
+                path,
+                user.token,
+                lambda: user.cart.discard(recipe_id),
+            )
+        return LoadRequest(
+            "cart_add",
+            "POST",
+            path,
+            user.token,
+            lambda: user.cart.add(recipe_id),
+        )
+
+    def download(self, user):
+        return LoadRequest(
+            "download_shopping_cart",
+            "GET",
+            "/api/recipes/download_shopping_cart/",
+            user.token,
+        )
+
+    def autocomplete(self, user):
+        query = urllib.parse.urlencode(
+            {"name": self.rng.choice(self.dataset.prefixes)}
+        )
+        return LoadRequest(
+            "autocomplete", "GET", f"/api/ingredients/?{query}"
+        )
+
+
+class WSGITransport:
+    def __init__(self):
+        self.application = get_wsgi_application()
+        self.factory = RequestFactory()
+
+    def call(self, method, path, token=None):
+        extra = {"HTTP_AUTHORIZATION": f"Token {token}"} if token else {}
+        environ = self.factory.generic(method, path, **extra).environ
+        statuses = []
+        body = self.application(
+            environ,
+            lambda status, headers, exc_info=None: statuses.append(status),
+        )
+        try:
+            content = b"".join(body)
+        finally:
+            body.close()
+        return int(statuses[0].split()[0]), content
+
+    def request(self, method, path, token=None):
+        started = time.perf_counter()
+        status, _ = self.call(method, path, token)
+        return time.perf_counter() - started, status < 400
+
+
+class HTTPTransport:
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def request(self, method, path, token=None):
+        headers = {"Authorization": f"Token {token}"} if token else {}
+        return fetch(
+            f"{self.base_url}{path}", headers, self.timeout, method=method
+        )
+
+
+def run_worker(transport, dataset, users, requests, seed, results):
+    rng = random.Random(seed)
+    mix = TrafficMix(dataset, rng)
+    try:
+        for _ in range(requests):
+            user = rng.choice(users)
+            request = mix.next_request(user)
+            latency, ok = transport.request(
+                request.method, request.path, request.token
+            )
+            if ok and request.on_success is not None:
+                request.on_success()
+            results[request.name].append((latency, ok))
+    finally:
+        connections.close_all()
+
+
+def run_traffic(transport, dataset, total, concurrency, seed=0):
+    results = defaultdict(list)
+    lock = threading.Lock()
+
+    def work(number):
+        worker_results = defaultdict(list)
+        run_worker(
+            transport,
+            dataset,
+            dataset.users[number::concurrency],
+            total // concurrency + (number < total % concurrency),
+            seed + number,
+            worker_results,
+        )
+        with lock:
+            for name, values in worker_results.items():
+                results[name].extend(values)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        list(executor.map(work, range(concurrency)))
+        elapsed = time.perf_counter() - started
+    endpoints = {
+        name: summarize(values, elapsed, LOAD_TEST_PERCENTILES)
+        for name, values in sorted(results.items())
+    }
+    return {
+        "total": summarize(
+            [value for values in results.values() for value in values],
+            elapsed,
+            LOAD_TEST_PERCENTILES,
+        ),
+        "endpoints": endpoints,
+    }
@@ -0,0 +1,414 @@
+import json
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import JSONField
+
+from recipes.loaders import JSON_CHUNK_SIZE, CSVStream
+from recipes.models import (Favorite, Follow, Recipe, RecipeIngredient,
+                            RecipeTag, ShoppingCard, ShoppingCartIngredient)
+
+User = get_user_model()
+
+GENERATED_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+UNUSABLE_PASSWORD = "!generated"
+TEXT_WORDS = (
+    "нарезать", "обжарить", "добавить", "посолить", "поперчить",
+    "перемешать", "запекать", "варить", "тушить", "остудить", "взбить",
+    "натереть", "залить", "подавать", "украсить", "до", "золотистой",
+    "корочки", "минут", "на", "среднем", "огне", "в", "духовке", "с",
+    "зеленью", "соусом", "сметаной", "сыром", "чесноком", "луком",
+    "морковью", "картофелем", "курицей", "говядиной", "рыбой", "тестом",
+    "маслом", "сахаром", "мукой", "яйцами", "молоком", "лимоном",
+)
+RECIPE_DISHES = (
+    "Суп", "Салат", "Пирог", "Рагу", "Запеканка", "Каша", "Паста",
+    "Омлет", "Котлеты", "Плов", "Блины", "Оладьи", "Жаркое", "Соус",
+)
+USER_FIELDS = (
+    "id",
+    "password",
+    "last_login",
+    "is_superuser",
+    "username",
+    "first_name",
+    "last_name",
+    "email",
+    "is_staff",
+    "is_active",
+    "date_joined",
+    "followers_count",
+    "recipes_count",
+)
+RECIPE_FIELDS = (
+    "id",
+    "author_id",
+    "name",
+    "image",
+    "image_variants",
+    "text",
+    "cooking_time",
+    "pub_date",
+    "updated_at",
+    "search_vector",
+    "favorites_count",
+    "shopping_carts_count",
+)
+
+
+class ZipfSampler:
+    def __init__(self, size, exponent, rng):
+        self.size = size
+        self.values = list(range(size))
+        rng.shuffle(self.values)
+        self.cum_weights = list(
+            accumulate(rank ** -exponent for rank in range(1, size + 1))
+        )
+
+    def sample(self, rng, k):
+        return rng.choices(self.values, cum_weights=self.cum_weights, k=k)
+
+    def sample_distinct(self, rng, k, exclude=None):
+        k = min(k, self.size - (exclude is not None))
+        chosen = set()
+        for _ in range(4):
+            if len(chosen) >= k:
+                break
+            chosen.update(self.sample(rng, k - len(chosen)))
+            chosen.discard(exclude)
+        while len(chosen) < k:
+            chosen.add(rng.randrange(self.size))
+            chosen.discard(exclude)
+        return chosen
+
+    def split(self, rng, total):
+        scale = total / self.cum_weights[-1]
+        previous = 0
+        for value, cumulative in zip(self.values, self.cum_weights):
+            yield value, int((cumulative - previous) * scale + rng.random())
+            previous = cumulative
+
+
+def count_values(values, size):
+    counts = array("q", bytes(8 * size))
+    for value in values:
+        counts[value] += 1
+    return counts
+
+
+@contextmanager
+def foreign_keys_dropped(models):
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname, "
+            "pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE contype = 'f' AND conrelid::regclass::text = ANY(%s)",
+            [[model._meta.db_table for model in models]],
+        )
+        constraints = cursor.fetchall()
+        for table, name, _ in constraints:
+            cursor.execute(
+                f"ALTER TABLE {table} DROP CONSTRAINT {quote(name)}"
+            )
+    yield
+    with connection.cursor() as cursor:
+        for table, name, definition in constraints:
+            cursor.execute(
+                f"ALTER TABLE {table} ADD CONSTRAINT {quote(name)} "
+                f"{definition}"
+            )
+
+
+@contextmanager
+def index_dropped(model, index):
+    with connection.schema_editor() as schema_editor:
+        schema_editor.remove_index(model, index)
+    yield
+    with connection.schema_editor() as schema_editor:
+        schema_editor.add_index(model, index)
+
+
+class TableWriter:
+    def __init__(self, use_copy, batch_size):
+        self.use_copy = use_copy
+        self.batch_size = batch_size
+
+    def write(self, model, fields, rows):
+        if self.use_copy:
+            return self.copy(model, fields, rows)
+        return self.bulk_create(model, fields, rows)
+
+    def copy(self, model, fields, rows):
+        quote = connection.ops.quote_name
+        json_indexes = [
+            index
+            for index, field in enumerate(fields)
+            if isinstance(model._meta.get_field(field), JSONField)
+        ]
+        if json_indexes:
+            rows = (
+                [
+                    json.dumps(value) if index in json_indexes else value
+                    for index, value in enumerate(row)
+                ]
+                for row in rows
+            )
+        columns = ", ".join(
+            quote(model._meta.get_field(field).column) for field in fields
+        )
+        stream = CSVStream(rows)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote(model._meta.db_table)} ({columns}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                stream,
+                size=JSON_CHUNK_SIZE,
+            )
+        return stream.count
+
+    def bulk_create(self, model, fields, rows):
+        auto_fields = [
+            field.attname
+            for field in model._meta.concrete_fields
+            if field.attname in fields
+            and (
+                getattr(field, "auto_now", False)
+                or getattr(field, "auto_now_add", False)
+            )
+        ]
+        rows = iter(rows)
+        count = 0
+        while batch := list(islice(rows, self.batch_size)):
+            objects = [model(**dict(zip(fields, row))) for row in batch]
+            model.objects.bulk_create(objects)
+            if auto_fields:
+                for obj, row in zip(objects, batch):
+                    for field in auto_fields:
+                        setattr(obj, field, row[fields.index(field)])
+                model.objects.bulk_update(objects, auto_fields)
+            count += len(objects)
+        return count
+
+
+class DataGenerator:
+    def __init__(
+        self,
+        seed,
+        users,
+        recipes,
+        follows,
+        favorites,
+        shopping_carts,
+        tag_ids,
+        ingredient_ids,
+        exponent=1.1,
+        prefix="gen_",
+    ):
+        self.seed = seed
+        self.users = users
+        self.recipes = recipes
+        self.follows = follows
+        self.favorites = favorites
+        self.shopping_carts = shopping_carts
+        self.tag_ids = tag_ids
+        self.ingredient_ids = ingredient_ids
+        self.exponent = exponent
+        self.prefix = prefix
+        self.first_user_id = (
+            User.objects.order_by("-pk").values_list("pk", flat=True).first()
+            or 0
+        ) + 1
+        self.first_recipe_id = (
+            Recipe.objects.order_by("-pk")
+            .values_list("pk", flat=True)
+            .first()
+            or 0
+        ) + 1
+        self.authors = ZipfSampler(users, exponent, self.get_rng("authors"))
+        self.popular_recipes = ZipfSampler(
+            recipes, exponent, self.get_rng("popular_recipes")
+        )
+        self.popular_ingredients = ZipfSampler(
+            len(ingredient_ids), exponent, self.get_rng("ingredients")
+        )
+        self.recipe_authors = array(
+            "q", self.authors.sample(self.get_rng("recipe_authors"), recipes)
+        )
+
+    def get_rng(self, name):
+        return random.Random(f"{self.seed}:{name}")
+
+    def generate_pairs(self, name, total, targets, exclude_self=False):
+        rng = self.get_rng(name)
+        actors = ZipfSampler(self.users, self.exponent, rng)
+        for actor, count in actors.split(rng, total):
+            if not count:
+                continue
+            for target in targets.sample_distinct(
+                rng, count, exclude=actor if exclude_self else None
+            ):
+                yield actor, target
+
+    def get_follows(self):
+        return self.generate_pairs(
+            "follows", self.follows, self.authors, exclude_self=True
+        )
+
+    def get_favorites(self):
+        return self.generate_pairs(
+            "favorites", self.favorites, self.popular_recipes
+        )
+
+    def get_shopping_carts(self):
+        return self.generate_pairs(
+            "shopping_carts", self.shopping_carts, self.popular_recipes
+        )
+
+    def get_user_rows(self):
+        followers = count_values(
+            (author for _, author in self.get_follows()), self.users
+        )
+        recipes = count_values(self.recipe_authors, self.users)
+        for number in range(self.users):
+            username = f"{self.prefix}{number}"
+            yield (
+                self.first_user_id + number,
+                UNUSABLE_PASSWORD,
+                None,
+                False,
+                username,
+                "Пользователь",
+                str(number),
+                f"{username}@example.com",
+                False,
+                True,
+                GENERATED_EPOCH,
+                followers[number],
+                recipes[number],
+            )
+
+    def get_recipe_rows(self):
+        rng = self.get_rng("recipes")
+        favorites = count_values(
+            (recipe for _, recipe in self.get_favorites()), self.recipes
+        )
+        shopping_carts = count_values(
+            (recipe for _, recipe in self.get_shopping_carts()), self.recipes
+        )
+        for number, author in enumerate(self.recipe_authors):
+            published = GENERATED_EPOCH + timedelta(minutes=number)
+            yield (
+                self.first_recipe_id + number,
+                self.first_user_id + author,
+                f"{rng.choice(RECIPE_DISHES)} {number}",
+                f"recipes/images/generated_{number % 100}.jpg",
+                {},
+                " ".join(rng.choices(TEXT_WORDS, k=rng.randint(10, 40))),
+                rng.randint(1, 180),
+                published,
+                published,
+                None,
+                favorites[number],
+                shopping_carts[number],
+            )
+
+    def get_recipe_tag_rows(self):
+        rng = self.get_rng("recipe_tags")
+        for number in range(self.recipes):
+            for tag_id in rng.sample(
+                self.tag_ids, rng.randint(1, min(3, len(self.tag_ids)))
+            ):
+                yield self.first_recipe_id + number, tag_id
+
+    def get_recipe_ingredient_rows(self):
+        rng = self.get_rng("recipe_ingredients")
+        for number in range(self.recipes):
+            for index in self.popular_ingredients.sample_distinct(
+                rng, rng.randint(3, 12)
+            ):
+                yield (
+                    self.first_recipe_id + number,
+                    self.ingredient_ids[index],
+                    rng.randint(1, 500),
+                )
+
+    def get_relation_rows(self, pairs, first_target_id):
+        for actor, target in pairs:
+            yield self.first_user_id + actor, first_target_id + target
+
+    def get_tables(self):
+        return (
+            (User, USER_FIELDS, self.get_user_rows),
+            (Recipe, RECIPE_FIELDS, self.get_recipe_rows),
+            (RecipeTag, ("recipe_id", "tag_id"), self.get_recipe_tag_rows),
+            (
+                RecipeIngredient,
+                ("recipe_id", "ingredient_id", "amount"),
+                self.get_recipe_ingredient_rows,
+            ),
+            (
+                Follow,
+                ("user_id", "author_id"),
+                lambda: self.get_relation_rows(
+                    self.get_follows(), self.first_user_id
+                ),
+            ),
+            (
+                Favorite,
+                ("user_id", "recipe_id"),
+                lambda: self.get_relation_rows(
+                    self.get_favorites(), self.first_recipe_id
+                ),
+            ),
+            (
+                ShoppingCard,
+                ("user_id", "recipe_id"),
+                lambda: self.get_relation_rows(
+                    self.get_shopping_carts(), self.first_recipe_id
+                ),
+            ),
+        )
+
+    def build_shopping_lists(self):
+        quote = connection.ops.quote_name
+        cart = ShoppingCard._meta
+        recipe_ingredient = RecipeIngredient._meta
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote(ShoppingCartIngredient._meta.db_table)} "
+                "(user_id, ingredient_id, amount) "
+                "SELECT cart.user_id, item.ingredient_id, SUM(item.amount) "
+                f"FROM {quote(cart.db_table)} cart "
+                f"JOIN {quote(recipe_ingredient.db_table)} item "
+                "ON item.recipe_id = cart.recipe_id "
+                "WHERE cart.user_id >= %s "
+                "GROUP BY cart.user_id, item.ingredient_id",
+                [self.first_user_id],
+            )
+            return cursor.rowcount
+
+    def fill_search_vectors(self):
+        recipes = Recipe.objects.filter(pk__gte=self.first_recipe_id)
+        if not recipes.is_postgresql():
+            return 0
+        index = next(
+            index
+            for index in Recipe._meta.indexes
+            if index.fields == ["search_vector"]
+        )
+        with index_dropped(Recipe, index):
+            return recipes.update_search_vector()
+
+    def reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Recipe]
+            ):
+                cursor.execute(sql)
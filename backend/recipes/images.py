@@ -0,0 +1,83 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image
+
+from recipes.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANT_FORMATS = {
+    "": ("JPEG", "jpg", {"quality": 85, "optimize": True}),
+    "_webp": ("WEBP", "webp", {"quality": 80}),
+}
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_VARIANT_WORKERS,
+        thread_name_prefix="image-variants",
+    )
+
+
+def schedule_image_variants(recipe):
+    recipe_id, image_name = recipe.pk, recipe.image.name
+
+    def submit():
+        if settings.IMAGE_VARIANT_WORKERS:
+            get_executor().submit(run_in_worker, recipe_id, image_name)
+        else:
+            build_image_variants(recipe_id, image_name)
+
+    transaction.on_commit(submit)
+
+
+def run_in_worker(recipe_id, image_name):
+    try:
+        build_image_variants(recipe_id, image_name)
+    except Exception:
+        logger.exception(
+            "Не удалось подготовить варианты картинки рецепта %s", recipe_id
+        )
+    finally:
+        connections.close_all()
+
+
+def resize_to_width(image, width):
+    if image.width <= width:
+        return image.copy()
+    height = max(round(image.height * width / image.width), 1)
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def build_image_variants(recipe_id, image_name):
+    storage = Recipe._meta.get_field("image").storage
+    root = os.path.splitext(image_name)[0]
+    variants = {}
+    with storage.open(image_name) as file, Image.open(file) as image:
+        image.load()
+        for variant, width in settings.RECIPE_IMAGE_VARIANTS.items():
+            resized = resize_to_width(image, width)
+            for suffix, (image_format, ext, options) in (
+                IMAGE_VARIANT_FORMATS.items()
+            ):
+                converted = resized
+                if image_format == "JPEG" and resized.mode != "RGB":
+                    converted = resized.convert("RGB")
+                buffer = io.BytesIO()
+                converted.save(buffer, image_format, **options)
+                variants[f"{variant}{suffix}"] = storage.save(
+                    f"{root}_{variant}.{ext}", ContentFile(buffer.getvalue())
+                )
+    recipe = Recipe.objects.filter(pk=recipe_id, image=image_name).first()
+    if recipe is not None:
+        recipe.image_variants = variants
+        recipe.save(update_fields=["image_variants", "updated_at"])
+    return variants
@@ -0,0 +1,329 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file):
+        if row:
+            yield dict(zip(fields, (value.strip() for value in row)))
+
+
+def read_json(file, fields):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    for chunk in iter(lambda: file.read(JSON_CHUNK_SIZE), ""):
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != "[":
+                    raise CommandError("JSON должен содержать список объектов")
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break
+            yield {field: str(item[field]).strip() for field in fields}
+            buffer = buffer[end:]
+    raise CommandError("JSON оборван: не найдена закрывающая скобка")
+
+
+READERS = {".csv": read_csv, ".json": read_json}
+
+
+class CSVStream(io.TextIOBase):
+    def __init__(self, rows, fields=None):
+        self.rows = iter(rows)
+        self.fields = fields
+        self.buffer = ""
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        output = io.StringIO()
+        output.write(self.buffer)
+        writer = csv.writer(output)
+        while size < 0 or output.tell() < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            if self.fields is not None:
+                row = [row[field] for field in self.fields]
+            writer.writerow(row)
+            self.count += 1
+        data = output.getvalue()
+        if size < 0:
+            size = len(data)
+        self.buffer = data[size:]
+        return data[:size]
+
+
+class CatalogLoader:
+    def __init__(self, model, fields, key, batch_size=1000, update=False):
+        self.model = model
+        self.fields = fields
+        self.key = key
+        self.update_fields = [
+            field for field in fields if field not in key
+        ] if update else []
+        self.unique_fields = [
+            field
+            for field in fields
+            if field not in key and model._meta.get_field(field).unique
+        ]
+        self.batch_size = batch_size
+        self.inserted = self.updated = self.skipped = 0
+        self.conflicts = []
+
+    def get_key(self, row):
+        return tuple(row[field] for field in self.key)
+
+    def get_existing(self, keys):
+        return {
+            self.get_key(vars(obj)): obj
+            for obj in self.model.objects.filter(
+                **{f"{self.key[0]}__in": {key[0] for key in keys}}
+            )
+        }
+
+    def find_conflicts(self, rows):
+        conflicts = set()
+        for field in self.unique_fields:
+            owners = {
+                value: tuple(key)
+                for value, *key in self.model.objects.filter(
+                    **{f"{field}__in": {row[field] for row in rows.values()}}
+                ).values_list(field, *self.key)
+            }
+            conflicts.update(
+                key
+                for key, row in rows.items()
+                if owners.get(row[field], key) != key
+            )
+        return conflicts
+
+    def load(self, rows):
+        if connection.vendor == "postgresql":
+            self.copy_upsert(rows)
+        else:
+            self.bulk_upsert(rows)
+
+    def bulk_upsert(self, rows):
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            with transaction.atomic():
+                self.upsert_batch(batch)
+
+    def upsert_batch(self, batch):
+        unique_rows = {self.get_key(row): row for row in batch}
+        self.skipped += len(batch) - len(unique_rows)
+        conflicts = self.find_conflicts(unique_rows)
+        unique_rows = {
+            key: row
+            for key, row in unique_rows.items()
+            if key not in conflicts
+        }
+        existing = self.get_existing(unique_rows)
+        new_rows = {
+            key: row
+            for key, row in unique_rows.items()
+            if key not in existing
+        }
+        self.model.objects.bulk_create(
+            [self.model(**row) for row in new_rows.values()],
+            ignore_conflicts=True,
+        )
+        if new_rows:
+            created = self.get_existing(new_rows).keys() & new_rows.keys()
+            conflicts.update(new_rows.keys() - created)
+            self.inserted += len(created)
+        self.conflicts.extend(sorted(conflicts))
+        changed = []
+        now = timezone.now()
+        for key, obj in existing.items():
+            row = unique_rows.get(key)
+            if row is None:
+                continue
+            if any(getattr(obj, f) != row[f] for f in self.update_fields):
+                for field in self.update_fields:
+                    setattr(obj, field, row[field])
+                obj.updated_at = now
+                changed.append(obj)
+            else:
+                self.skipped += 1
+        if changed:
+            self.model.objects.bulk_update(
+                changed, [*self.update_fields, "updated_at"]
+            )
+        self.updated += len(changed)
+
+    def copy_upsert(self, rows):
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        columns = ", ".join(quote(field) for field in self.fields)
+        key = ", ".join(quote(field) for field in self.key)
+        if self.update_fields:
+            targets = ", ".join(
+                f"{table}.{quote(field)}" for field in self.update_fields
+            )
+            excluded = ", ".join(
+                f"EXCLUDED.{quote(field)}" for field in self.update_fields
+            )
+            assignments = ", ".join(
+                f"{quote(field)} = EXCLUDED.{quote(field)}"
+                for field in [*self.update_fields, "updated_at"]
+            )
+            on_conflict = (
+                f"DO UPDATE SET {assignments} "
+                f"WHERE ROW({targets}) IS DISTINCT FROM ROW({excluded})"
+            )
+        else:
+            on_conflict = "DO NOTHING"
+        owned_keys = ", ".join(
+            f"{table}.{quote(field)}" for field in self.key
+        )
+        staging_keys = ", ".join(
+            f"catalog_staging.{quote(field)}" for field in self.key
+        )
+        later_keys = ", ".join(f"later.{quote(field)}" for field in self.key)
+        conflict = " OR ".join(
+            f"EXISTS (SELECT 1 FROM {table} "
+            f"WHERE {table}.{quote(field)} = "
+            f"catalog_staging.{quote(field)} "
+            f"AND ROW({owned_keys}) IS DISTINCT FROM ROW({staging_keys})) "
+            "OR EXISTS (SELECT 1 FROM catalog_staging AS earlier "
+            f"WHERE earlier.{quote(field)} = catalog_staging.{quote(field)} "
+            "AND earlier.line_number < catalog_staging.line_number)"
+            for field in self.unique_fields
+        ) or "FALSE"
+        stream = CSVStream(rows, self.fields)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE catalog_staging ("
+                + ", ".join(f"{quote(field)} text" for field in self.fields)
+                + ", line_number bigserial) ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                f"COPY catalog_staging ({columns}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                stream,
+                size=JSON_CHUNK_SIZE,
+            )
+            cursor.execute(
+                "DELETE FROM catalog_staging USING catalog_staging AS later "
+                f"WHERE ROW({later_keys}) = ROW({staging_keys}) "
+                "AND later.line_number > catalog_staging.line_number"
+            )
+            cursor.execute(
+                f"SELECT {key} FROM catalog_staging "
+                f"WHERE {conflict} ORDER BY {key}"
+            )
+            conflicts = cursor.fetchall()
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}, updated_at) "
+                f"SELECT {columns}, now() "
+                f"FROM catalog_staging WHERE NOT ({conflict}) "
+                f"ON CONFLICT ({key}) {on_conflict} "
+                "RETURNING (xmax = 0)"
+            )
+            results = [inserted for inserted, in cursor.fetchall()]
+        self.inserted += sum(results)
+        self.updated += len(results) - sum(results)
+        self.skipped += stream.count - len(results) - len(conflicts)
+        self.conflicts.extend(conflicts)
+
+
+class CatalogLoadCommand(BaseCommand):
+    model = None
+    fields = ()
+    key = ()
+    default_file = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            type=Path,
+            default=self.default_file,
+            help="Файл CSV без заголовка или JSON со списком объектов",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Обновлять существующие записи вместо пропуска",
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Не использовать COPY даже на PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        path = options["file"]
+        if path is None:
+            raise CommandError("Укажите файл с данными через --file")
+        if not path.is_file():
+            raise CommandError(f"Файл {path} не найден")
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError("Поддерживаются только файлы .csv и .json")
+        loader = CatalogLoader(
+            self.model,
+            self.fields,
+            self.key,
+            batch_size=options["batch_size"],
+            update=options["update"],
+        )
+        started = time.monotonic()
+        with open(path, encoding="utf-8") as file:
+            rows = reader(file, self.fields)
+            if options["no_copy"]:
+                loader.bulk_upsert(rows)
+            else:
+                loader.load(rows)
+        elapsed = max(time.monotonic() - started, 1e-6)
+        total = (
+            loader.inserted
+            + loader.updated
+            + loader.skipped
+            + len(loader.conflicts)
+        )
+        for key in loader.conflicts:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Не загружено {', '.join(map(str, key))}: "
+                    "значение уникального поля занято другой записью"
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{self.model._meta.verbose_name_plural} загружены: "
+                f"добавлено {loader.inserted}, "
+                f"обновлено {loader.updated}, "
+                f"пропущено {loader.skipped}, "
+                f"конфликтов {len(loader.conflicts)} "
+                f"за {elapsed:.2f} с ({total / elapsed:.0f} строк/с)"
+            )
+        )
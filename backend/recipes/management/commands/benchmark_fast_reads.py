@@ -0,0 +1,102 @@
+import json
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.fast_serializers import FastRecipeReadSerializer
+from api.serializers import RecipeReadSerializer
+from recipes.benchmarks import WSGITransport, measure
+from recipes.models import Recipe
+
+User = get_user_model()
+
+DEFAULT_LIMITS = (6, 100)
+VARIANTS = (("drf", False), ("fast", True))
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость обычного сериализатора списка рецептов и "
+        "быстрого на .values(): время сборки данных страницы (запросы и "
+        "сериализация) и время запроса к API целиком. Запросы идут от "
+        "пользователя с избранным, чтобы обойти кэш анонимных ответов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            action="append",
+            dest="limits",
+            type=int,
+            help="Размер страницы, можно указать несколько раз",
+        )
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+
+    def build_page(self, user, limit, fast):
+        request = RequestFactory().get("/api/recipes/")
+        request.user = user
+        queryset = Recipe.objects.annotate_user_data(
+            user.pk
+        ).prefetch_read_data(user.pk)
+        if fast:
+            return FastRecipeReadSerializer(
+                FastRecipeReadSerializer.get_rows(queryset)[:limit],
+                {"request": request},
+            ).data
+        return RecipeReadSerializer(
+            queryset[:limit], many=True, context={"request": request}
+        ).data
+
+    def request_page(self, transport, token, limit, fast):
+        with override_settings(FAST_RECIPE_READS=fast):
+            status, _ = transport.call(
+                "GET", f"/api/recipes/?limit={limit}", token
+            )
+        if status != 200:
+            raise CommandError(f"Список рецептов вернул статус {status}")
+
+    def handle(self, *args, **options):
+        user = (
+            User.objects.filter(favorites__isnull=False)
+            .order_by("pk")
+            .first()
+        )
+        if user is None or not Recipe.objects.exists():
+            raise CommandError(
+                "Нужны рецепты и пользователь с избранным: "
+                "используйте generate_data или load_test"
+            )
+        token = Token.objects.get_or_create(user=user)[0].key
+        transport = WSGITransport()
+        results = {}
+        for limit in options["limits"] or DEFAULT_LIMITS:
+            results[limit] = {}
+            stages = {
+                "serializer": partial(self.build_page, user, limit),
+                "request": partial(self.request_page, transport, token, limit),
+            }
+            for stage, run in stages.items():
+                summaries = {
+                    name: measure(
+                        partial(run, fast),
+                        options["iterations"],
+                        options["warmup"],
+                    )
+                    for name, fast in VARIANTS
+                }
+                summaries["speedup"] = round(
+                    summaries["drf"]["p50_ms"] / summaries["fast"]["p50_ms"],
+                    2,
+                )
+                results[limit][stage] = summaries
+                self.stdout.write(
+                    f"limit={limit:<4} {stage:<10} "
+                    f"DRF p50 {summaries['drf']['p50_ms']} мс, "
+                    f"быстрый p50 {summaries['fast']['p50_ms']} мс, "
+                    f"ускорение {summaries['speedup']}x"
+                )
+        self.stdout.write(json.dumps(results))
@@ -0,0 +1,151 @@
+import base64
+import io
+import json
+import os
+from collections import OrderedDict
+from functools import partial
+
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory
+from PIL import Image
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import RecipeReadSerializer
+from recipes.benchmarks import measure
+from recipes.models import Ingredient, Recipe, Tag
+
+DEFAULT_LIMITS = (6, 100)
+IMAGE_SIDES = (256, 1024)
+
+
+def get_list_payload(limit):
+    request = RequestFactory().get("/api/recipes/")
+    recipes = RecipeReadSerializer(
+        Recipe.objects.annotate_user_data(None).prefetch_read_data(None)[
+            :limit
+        ],
+        many=True,
+        context={"request": request},
+    ).data
+    return OrderedDict(
+        [
+            ("count", Recipe.objects.count()),
+            ("next", "http://testserver/api/recipes/?page=2"),
+            ("previous", None),
+            ("results", recipes),
+        ]
+    )
+
+
+def get_write_payload(side):
+    output = io.BytesIO()
+    Image.frombytes("RGB", (side, side), os.urandom(side * side * 3)).save(
+        output, "PNG"
+    )
+    return {
+        "ingredients": [
+            {"id": pk, "amount": number + 1}
+            for number, pk in enumerate(
+                Ingredient.objects.order_by("pk").values_list(
+                    "pk", flat=True
+                )[:10]
+            )
+        ],
+        "tags": list(Tag.objects.values_list("pk", flat=True)),
+        "image": "data:image/png;base64,"
+        + base64.b64encode(output.getvalue()).decode(),
+        "name": "Пирог с капустой",
+        "text": "Тесто замесить, начинку потушить, выпекать 40 минут. " * 20,
+        "cooking_time": 60,
+    }
+
+
+def parse(parser, content):
+    return parser.parse(io.BytesIO(content))
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает стандартные JSON-рендерер и парсер DRF с быстрыми "
+        "на orjson: рендеринг страниц списка рецептов и разбор тела "
+        "создания рецепта с картинкой в base64"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            action="append",
+            dest="limits",
+            type=int,
+            help="Размер страницы списка, можно указать несколько раз",
+        )
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--warmup", type=int, default=10)
+
+    def compare(self, name, payload, variants, options):
+        summaries = {
+            variant: measure(
+                partial(function, payload),
+                options["iterations"],
+                options["warmup"],
+            )
+            for variant, function in variants.items()
+        }
+        summaries["speedup"] = round(
+            summaries["stdlib"]["p50_ms"] / summaries["fast"]["p50_ms"], 2
+        )
+        self.stdout.write(
+            f"{name:<24} stdlib p50 {summaries['stdlib']['p50_ms']} мс, "
+            f"быстрый p50 {summaries['fast']['p50_ms']} мс, "
+            f"ускорение {summaries['speedup']}x"
+        )
+        return summaries
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError(
+                "Нужны рецепты: используйте generate_data или load_test"
+            )
+        if orjson is None:
+            self.stdout.write(
+                self.style.WARNING(
+                    "orjson не установлен: быстрые классы используют json"
+                )
+            )
+        results = {}
+        for limit in options["limits"] or DEFAULT_LIMITS:
+            payload = get_list_payload(limit)
+            if JSONRenderer().render(payload) != FastJSONRenderer().render(
+                payload
+            ):
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"Ответы на {limit} рецептов различаются побайтно"
+                    )
+                )
+            name = f"render list limit={limit}"
+            results[name] = self.compare(
+                name,
+                payload,
+                {
+                    "stdlib": JSONRenderer().render,
+                    "fast": FastJSONRenderer().render,
+                },
+                options,
+            )
+        for side in IMAGE_SIDES:
+            content = JSONRenderer().render(get_write_payload(side))
+            name = f"parse write {len(content) // 1024} KiB"
+            results[name] = self.compare(
+                name,
+                content,
+                {
+                    "stdlib": partial(parse, JSONParser()),
+                    "fast": partial(parse, FastJSONParser()),
+                },
+                options,
+            )
+        self.stdout.write(json.dumps(results))
@@ -0,0 +1,86 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.benchmarks import run_load, start_gunicorn, wait_until_ready
+
+DEFAULT_PATHS = (
+    "/api/recipes/",
+    "/api/recipes/?limit=12&page=2",
+    "/api/tags/",
+    "/api/ingredients/?name=мо",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает gunicorn с синхронными WSGI-воркерами и с "
+        "ASGI-воркерами uvicorn при одинаковом числе воркеров и "
+        "сравнивает пропускную способность и задержки на чтении"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--port", type=int, default=8100)
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Путь для нагрузки, можно указать несколько раз",
+        )
+        parser.add_argument(
+            "--token",
+            help="Токен пользователя, чтобы обойти кэш анонимных ответов",
+        )
+        parser.add_argument(
+            "--interface",
+            action="append",
+            dest="interfaces",
+            choices=("wsgi", "asgi"),
+        )
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or DEFAULT_PATHS
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Token {options['token']}"
+        results = {}
+        for number, interface in enumerate(
+            options["interfaces"] or ("wsgi", "asgi")
+        ):
+            port = options["port"] + number
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_gunicorn(interface, options["workers"], port)
+            try:
+                if not wait_until_ready(f"{base_url}/api/tags/"):
+                    raise CommandError(
+                        f"Сервер {interface} не запустился на порту {port}"
+                    )
+                urls = [f"{base_url}{path}" for path in paths]
+                run_load(urls, len(urls) * 5, options["concurrency"], headers)
+                results[interface] = run_load(
+                    urls,
+                    options["requests"],
+                    options["concurrency"],
+                    headers,
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            self.stdout.write(
+                f"{interface}: {json.dumps(results[interface])}"
+            )
+        self.stdout.write(
+            json.dumps(
+                {
+                    "workers": options["workers"],
+                    "concurrency": options["concurrency"],
+                    "paths": list(paths),
+                    "results": results,
+                },
+                indent=2,
+                ensure_ascii=False,
+            )
+        )
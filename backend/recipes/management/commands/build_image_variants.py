@@ -0,0 +1,33 @@
+from django.core.management import BaseCommand
+
+from recipes.images import build_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Готовит уменьшенные копии картинок рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Пересоздать копии и для рецептов, у которых они уже есть",
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image="")
+        if not options["all"]:
+            recipes = recipes.filter(image_variants={})
+        built = 0
+        for recipe_id, image_name in recipes.values_list(
+            "pk", "image"
+        ).iterator():
+            try:
+                build_image_variants(recipe_id, image_name)
+            except OSError as error:
+                self.stderr.write(f"Рецепт {recipe_id}: {error}")
+                continue
+            built += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Подготовлены копии картинок: {built}")
+        )
@@ -0,0 +1,142 @@
+import json
+import urllib.parse
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from api.cache import recipe_response_cache
+from recipes.benchmarks import WSGITransport
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+SNIPPET_SIZE = 80
+
+
+def get_first_difference(first, second):
+    for position, (left, right) in enumerate(zip(first, second)):
+        if left != right:
+            return position
+    return min(len(first), len(second))
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает побайтно ответы списка рецептов с обычным "
+        "сериализатором и с быстрым сериализатором на .values() "
+        "(FAST_RECIPE_READS): страницы, фильтры, сортировки и курсорная "
+        "пагинация для анонима и пользователей с избранным. Создаёт "
+        "токены выбранным пользователям. Завершается ошибкой при "
+        "расхождении"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=3,
+            help="Сколько пользователей с избранным проверить",
+        )
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=3,
+            help="Сколько страниц пройти в каждом списке",
+        )
+
+    def get_paths(self, pages, authenticated):
+        paths = [f"/api/recipes/?page={page}" for page in range(1, pages + 1)]
+        paths.append("/api/recipes/?limit=100")
+        paths.append("/api/recipes/?ordering=-favorites_count")
+        paths.extend(
+            f"/api/recipes/?tags={slug}"
+            for slug in Tag.objects.order_by("pk").values_list(
+                "slug", flat=True
+            )[:2]
+        )
+        author = (
+            User.objects.order_by("-recipes_count", "pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if author is not None:
+            paths.append(f"/api/recipes/?author={author}")
+        name = (
+            Recipe.objects.order_by("pk")
+            .values_list("name", flat=True)
+            .first()
+        )
+        for word in (name or "").split()[:1]:
+            paths.append(
+                f"/api/recipes/?{urllib.parse.urlencode({'search': word})}"
+            )
+        if authenticated:
+            paths.append("/api/recipes/?is_favorited=1")
+            paths.append("/api/recipes/?is_in_shopping_cart=1")
+        return paths
+
+    def fetch(self, transport, path, token, fast):
+        if token is None:
+            recipe_response_cache.bump_generation()
+        with override_settings(FAST_RECIPE_READS=fast):
+            return transport.call("GET", path, token)
+
+    def compare(self, transport, path, token):
+        expected = self.fetch(transport, path, token, fast=False)
+        actual = self.fetch(transport, path, token, fast=True)
+        if actual == expected:
+            return None
+        position = get_first_difference(expected[1], actual[1])
+        start = max(position - SNIPPET_SIZE // 2, 0)
+        return (
+            f"{path}: статус {expected[0]} и {actual[0]}, расхождение с "
+            f"байта {position}\n"
+            f"  обычный: {expected[1][start:start + SNIPPET_SIZE]!r}\n"
+            f"  быстрый: {actual[1][start:start + SNIPPET_SIZE]!r}"
+        )
+
+    def get_cursor_paths(self, transport, token, pages):
+        path = "/api/recipes/?pagination=cursor"
+        for _ in range(pages):
+            yield path
+            _, content = self.fetch(transport, path, token, fast=False)
+            next_url = json.loads(content).get("next")
+            if not next_url:
+                return
+            parts = urllib.parse.urlsplit(next_url)
+            path = f"{parts.path}?{parts.query}"
+
+    def handle(self, *args, **options):
+        users = list(
+            User.objects.filter(favorites__isnull=False)
+            .distinct()
+            .order_by("pk")[: options["users"]]
+        )
+        tokens = [None] + [
+            Token.objects.get_or_create(user=user)[0].key for user in users
+        ]
+        transport = WSGITransport()
+        checked = 0
+        errors = []
+        for token in tokens:
+            paths = [
+                *self.get_paths(options["pages"], token is not None),
+                *self.get_cursor_paths(transport, token, options["pages"]),
+            ]
+            for path in paths:
+                error = self.compare(transport, path, token)
+                checked += 1
+                if error:
+                    who = "аноним" if token is None else "пользователь"
+                    errors.append(f"[{who}] {error}")
+        for error in errors:
+            self.stdout.write(self.style.ERROR(error))
+        if errors:
+            raise CommandError(
+                f"Ответы различаются в {len(errors)} из {checked} запросов"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Ответы совпадают побайтно: {checked}")
+        )
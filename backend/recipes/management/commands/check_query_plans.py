@@ -0,0 +1,70 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.query_plans import check_hot_queries
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет через EXPLAIN, что частые запросы API используют "
+        "индексы, а не полное чтение больших таблиц. Запускается на "
+        "заполненной базе PostgreSQL"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user-id",
+            type=int,
+            help="Пользователь, от имени которого строятся запросы",
+        )
+        parser.add_argument(
+            "--no-seqscan",
+            action="store_true",
+            help=(
+                "Запретить планировщику последовательное чтение, "
+                "чтобы проверить само наличие подходящих индексов"
+            ),
+        )
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=10000,
+            help="Не проверять таблицы, в которых меньше строк",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Команда работает только с PostgreSQL")
+        user_id = options["user_id"]
+        if user_id is None:
+            user_id = User.objects.values_list("pk", flat=True).first() or 1
+        failed = []
+        with transaction.atomic(), connection.cursor() as cursor:
+            if options["no_seqscan"]:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, plan, full_scans in check_hot_queries(
+                cursor, user_id, options["min_rows"]
+            ):
+                if options["verbosity"] > 1:
+                    self.stdout.write(
+                        json.dumps(plan, indent=2, ensure_ascii=False)
+                    )
+                if full_scans:
+                    failed.append(name)
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f"{name}: полное чтение "
+                            f"{', '.join(full_scans)}"
+                        )
+                    )
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{name}: OK"))
+        if failed:
+            raise CommandError(
+                f"Запросы без подходящих индексов: {', '.join(failed)}"
+            )
@@ -0,0 +1,137 @@
+import time
+from contextlib import nullcontext
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.generators import DataGenerator, TableWriter, foreign_keys_dropped
+from recipes.models import Ingredient, ShoppingCartIngredient, Tag
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует большой синтетический набор данных: пользователей, "
+        "рецепты, подписки, избранное и списки покупок. Авторы, "
+        "популярные рецепты и подписчики распределены по закону Ципфа. "
+        "При одинаковом --seed получается одинаковый набор данных"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--recipes", type=int, default=100000)
+        parser.add_argument("--follows", type=int, default=50000)
+        parser.add_argument("--favorites", type=int, default=300000)
+        parser.add_argument("--shopping-carts", type=int, default=50000)
+        parser.add_argument(
+            "--zipf",
+            type=float,
+            default=1.1,
+            help="Показатель степени распределения Ципфа",
+        )
+        parser.add_argument(
+            "--prefix",
+            default="gen_",
+            help="Префикс имён сгенерированных пользователей",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Не использовать COPY даже на PostgreSQL",
+        )
+        parser.add_argument(
+            "--no-search-vector",
+            action="store_true",
+            help="Не заполнять поисковый вектор рецептов",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 2 or options["recipes"] < 1:
+            raise CommandError(
+                "Нужно хотя бы два пользователя и один рецепт"
+            )
+        tag_ids = list(Tag.objects.order_by("pk").values_list("pk", flat=True))
+        ingredient_ids = list(
+            Ingredient.objects.order_by("pk").values_list("pk", flat=True)
+        )
+        if not tag_ids or len(ingredient_ids) < 12:
+            raise CommandError(
+                "Сначала загрузите теги и ингредиенты: "
+                "load_tags и load_ingredients"
+            )
+        if User.objects.filter(
+            username__startswith=options["prefix"]
+        ).exists():
+            raise CommandError(
+                f"Пользователи с префиксом {options['prefix']} уже есть: "
+                "используйте чистую базу или другой --prefix"
+            )
+        is_postgresql = connection.vendor == "postgresql"
+        writer = TableWriter(
+            use_copy=is_postgresql and not options["no_copy"],
+            batch_size=options["batch_size"],
+        )
+        started = time.monotonic()
+        with transaction.atomic():
+            generator = DataGenerator(
+                options["seed"],
+                options["users"],
+                options["recipes"],
+                options["follows"],
+                options["favorites"],
+                options["shopping_carts"],
+                tag_ids,
+                ingredient_ids,
+                exponent=options["zipf"],
+                prefix=options["prefix"],
+            )
+            tables = generator.get_tables()
+            models = [model for model, _, _ in tables]
+            models.append(ShoppingCartIngredient)
+            with (
+                foreign_keys_dropped(models)
+                if is_postgresql
+                else nullcontext()
+            ):
+                for model, fields, get_rows in tables:
+                    self.write_table(writer, model, fields, get_rows())
+                self.run_step(
+                    "Списки покупок", generator.build_shopping_lists
+                )
+                if not options["no_search_vector"]:
+                    self.run_step(
+                        "Поисковый вектор", generator.fill_search_vectors
+                    )
+            if is_postgresql:
+                generator.reset_sequences()
+        if is_postgresql:
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "ANALYZE "
+                    + ", ".join(
+                        quote(model._meta.db_table) for model in models
+                    )
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Данные сгенерированы за {time.monotonic() - started:.1f} с"
+            )
+        )
+
+    def run_step(self, name, step):
+        started = time.monotonic()
+        count = step()
+        self.stdout.write(
+            f"{name}: {count} строк за {time.monotonic() - started:.1f} с"
+        )
+
+    def write_table(self, writer, model, fields, rows):
+        self.run_step(
+            model._meta.verbose_name_plural,
+            lambda: writer.write(model, fields, rows),
+        )
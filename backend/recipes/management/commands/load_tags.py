@@ -0,0 +1,14 @@
+from pathlib import Path
+
+from django.conf import settings
+
+from recipes.loaders import CatalogLoadCommand
+from recipes.models import Tag
+
+
+class Command(CatalogLoadCommand):
+    help = "Загружает теги из CSV или JSON, не создавая дублей"
+    model = Tag
+    fields = ("name", "color", "slug")
+    key = ("slug",)
+    default_file = Path(settings.DATA_FILES_DIR, "tags.json")
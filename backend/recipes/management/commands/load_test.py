@@ -0,0 +1,170 @@
+import json
+import os
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from recipes.benchmarks import (LOAD_TEST_MIX, HTTPTransport, WSGITransport,
+                                load_dataset, run_traffic, seed_load_dataset,
+                                start_gunicorn, wait_until_ready)
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу тестовыми пользователями и рецептами и нагружает "
+        "API смешанным трафиком: просмотр и фильтрация рецептов, подписки, "
+        "список покупок, скачивание списка и подсказки ингредиентов. "
+        "Пишет пропускную способность и перцентили задержек по каждому "
+        "эндпоинту в JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--recipes", type=int, default=500)
+        parser.add_argument(
+            "--ingredients",
+            type=int,
+            default=5,
+            help="Число ингредиентов в каждом рецепте",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--no-seed",
+            action="store_true",
+            help="Использовать данные предыдущего запуска",
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--warmup", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument(
+            "--target",
+            choices=("inprocess", "gunicorn"),
+            default="inprocess",
+            help=(
+                "Вызывать WSGI-приложение в этом процессе или слать HTTP "
+                "на локальный gunicorn"
+            ),
+        )
+        parser.add_argument(
+            "--interface", choices=("wsgi", "asgi"), default="wsgi"
+        )
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--port", type=int, default=8200)
+        parser.add_argument("--output", default="load_test.json")
+
+    def run(self, transport, dataset, options):
+        if options["warmup"]:
+            run_traffic(
+                transport,
+                dataset,
+                options["warmup"],
+                options["concurrency"],
+                options["seed"] + options["concurrency"],
+            )
+        return run_traffic(
+            transport,
+            dataset,
+            options["requests"],
+            options["concurrency"],
+            options["seed"],
+        )
+
+    def handle(self, *args, **options):
+        if not options["no_seed"]:
+            seed_load_dataset(
+                options["users"],
+                options["recipes"],
+                options["ingredients"],
+                options["seed"],
+            )
+        dataset = load_dataset()
+        if len(dataset.users) < options["concurrency"]:
+            raise CommandError(
+                "Пользователей должно быть не меньше, чем параллельных "
+                "потоков: у каждого потока свои пользователи"
+            )
+        if not dataset.recipe_ids:
+            raise CommandError("В базе нет рецептов для нагрузки")
+        if options["target"] == "inprocess":
+            results = self.run(WSGITransport(), dataset, options)
+        else:
+            base_url = f"http://127.0.0.1:{options['port']}"
+            server = start_gunicorn(
+                options["interface"], options["workers"], options["port"]
+            )
+            try:
+                if not wait_until_ready(f"{base_url}/api/tags/"):
+                    raise CommandError(
+                        f"Сервер не запустился на порту {options['port']}"
+                    )
+                results = self.run(HTTPTransport(base_url), dataset, options)
+            finally:
+                server.terminate()
+                server.wait()
+        report = {
+            "started_at": timezone.now().isoformat(),
+            "revision": get_revision(),
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "cpu_count": os.cpu_count(),
+                "machine": platform.node(),
+            },
+            "target": options["target"],
+            "interface": (
+                options["interface"]
+                if options["target"] == "gunicorn"
+                else "wsgi"
+            ),
+            "workers": (
+                options["workers"]
+                if options["target"] == "gunicorn"
+                else None
+            ),
+            "concurrency": options["concurrency"],
+            "requests": options["requests"],
+            "dataset": {
+                "users": len(dataset.users),
+                "recipes": len(dataset.recipe_ids),
+                "seed": options["seed"],
+            },
+            "mix": LOAD_TEST_MIX,
+            **results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        for name, summary in results["endpoints"].items():
+            self.stdout.write(
+                f"{name:<24} {summary['requests']:>6} запр. "
+                f"{summary['errors']:>4} ошиб. "
+                f"p50 {summary['p50_ms']} мс, "
+                f"p95 {summary['p95_ms']} мс, "
+                f"p99 {summary['p99_ms']} мс"
+            )
+        total = results["total"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Всего {total['requests']} запросов, {total['rps']} в "
+                f"секунду, p99 {total['p99_ms']} мс. "
+                f"Отчёт: {options['output']}"
+            )
+        )
@@ -0,0 +1,85 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingCartIngredient
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сводные списки покупок пользователей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только проверить расхождения, не исправляя их",
+        )
+
+    def handle(self, *args, **options):
+        totals = (
+            RecipeIngredient.objects.filter(
+                recipe__shopping_card__isnull=False
+            )
+            .values_list("recipe__shopping_card__user", "ingredient")
+            .annotate(total_amount=Sum("amount"))
+            .order_by()
+        )
+        expected = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in totals.iterator()
+        }
+        actual = {
+            (user_id, ingredient_id): (pk, amount)
+            for pk, user_id, ingredient_id, amount in (
+                ShoppingCartIngredient.objects.values_list(
+                    "pk", "user_id", "ingredient_id", "amount"
+                ).iterator()
+            )
+        }
+        missing = expected.keys() - actual.keys()
+        stale = actual.keys() - expected.keys()
+        changed = {
+            key
+            for key in expected.keys() & actual.keys()
+            if expected[key] != actual[key][1]
+        }
+        report = (
+            f"отсутствует: {len(missing)}, "
+            f"лишних: {len(stale)}, "
+            f"с неверным количеством: {len(changed)}"
+        )
+        if not (missing or stale or changed):
+            self.stdout.write(self.style.SUCCESS("Расхождений не найдено"))
+            return
+        if options["check"]:
+            raise CommandError(f"Найдены расхождения: {report}")
+        with transaction.atomic():
+            ShoppingCartIngredient.objects.filter(
+                pk__in=[actual[key][0] for key in stale]
+            ).delete()
+            ShoppingCartIngredient.objects.bulk_update(
+                [
+                    ShoppingCartIngredient(
+                        pk=actual[key][0], amount=expected[key]
+                    )
+                    for key in changed
+                ],
+                ["amount"],
+                batch_size=BATCH_SIZE,
+            )
+            ShoppingCartIngredient.objects.bulk_create(
+                [
+                    ShoppingCartIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=expected[(user_id, ingredient_id)],
+                    )
+                    for user_id, ingredient_id in missing
+                ],
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Списки покупок пересчитаны: {report}")
+        )
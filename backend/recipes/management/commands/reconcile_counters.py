@@ -0,0 +1,43 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from recipes.counters import COUNTERS, get_actual_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет счётчики избранного, списков покупок, подписчиков и "
+        "рецептов с фактическими данными и исправляет расхождения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только проверить расхождения, не исправляя их",
+        )
+
+    def handle(self, *args, **options):
+        drift = {}
+        with transaction.atomic():
+            for model, field, related_model, related_field in COUNTERS:
+                actual = get_actual_count(related_model, related_field)
+                drifted = model.objects.annotate(actual=actual).exclude(
+                    **{field: F("actual")}
+                )
+                count = drifted.count()
+                if count and not options["check"]:
+                    model.objects.filter(
+                        pk__in=drifted.values("pk")
+                    ).update(**{field: actual})
+                drift[f"{model._meta.model_name}.{field}"] = count
+        report = ", ".join(f"{name}: {count}" for name, count in drift.items())
+        if not any(drift.values()):
+            self.stdout.write(self.style.SUCCESS("Расхождений не найдено"))
+            return
+        if options["check"]:
+            raise CommandError(f"Найдены расхождения: {report}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Счётчики пересчитаны: {report}")
+        )
@@ -0,0 +1,68 @@
+# Generated by Django 3.2.25 on 2026-10-18 04:58
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    ShoppingCard = apps.get_model('recipes', 'ShoppingCard')
+    Follow = apps.get_model('recipes', 'Follow')
+    User = apps.get_model('users', 'User')
+    counters = (
+        (Recipe, 'favorites_count', Favorite, 'recipe'),
+        (Recipe, 'shopping_carts_count', ShoppingCard, 'recipe'),
+        (User, 'followers_count', Follow, 'author'),
+        (User, 'recipes_count', Recipe, 'author'),
+    )
+    for model, field, related_model, related_field in counters:
+        model.objects.update(
+            **{
+                field: Coalesce(
+                    Subquery(
+                        related_model.objects.filter(
+                            **{related_field: OuterRef('pk')}
+                        )
+                        .order_by()
+                        .values(related_field)
+                        .annotate(count=Count('pk'))
+                        .values('count')
+                    ),
+                    Value(0),
+                )
+            }
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_search_vector'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False,
+                verbose_name='Добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(
+                default=0, editable=False,
+                verbose_name='Добавлений в списки покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
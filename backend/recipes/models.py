@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import Exists, OuterRef
+from django.db import connections, models
+from django.db.models import (Case, Count, Exists, F, FloatField, OuterRef,
+                              Prefetch, Q, Subquery, Sum, Value, When)
 
 from recipes.validators import validate_hex_color
 
@@ -20,6 +26,9 @@ class Tag(models.Model):
     slug = models.SlugField(
         verbose_name="Уникальный слаг", max_length=200, unique=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True
+    )
 
     class Meta:
         verbose_name = "Тег"
@@ -43,6 +52,9 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         verbose_name="Единица измерения", max_length=200
     )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True
+    )
 
     class Meta:
         verbose_name = "Ингредиент"
@@ -81,6 +93,93 @@ class RecipeQuerySet(models.QuerySet):
             ),
         )
 
+    def prefetch_read_data(self, user_id):
+        authors = User.objects.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(user_id=user_id, author=OuterRef("pk"))
+            )
+        )
+        return self.prefetch_related(
+            Prefetch("author", queryset=authors),
+            Prefetch("tags", queryset=Tag.objects.order_by("pk")),
+            Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient"
+                ).order_by("pk"),
+            ),
+        )
+
+    def followed_by(self, user_id):
+        return self.filter(author__following__user_id=user_id)
+
+    def is_postgresql(self):
+        return connections[self.db].vendor == "postgresql"
+
+    def update_search_vector(self):
+        if not self.is_postgresql():
+            return 0
+        config = settings.RECIPE_SEARCH_CONFIG
+        ingredient_names = (
+            RecipeIngredient.objects.filter(recipe=OuterRef("pk"))
+            .values("recipe")
+            .annotate(
+                names=StringAgg(
+                    Subquery(
+                        Ingredient.objects.filter(
+                            pk=OuterRef("ingredient_id")
+                        ).values("name")
+                    ),
+                    " ",
+                )
+            )
+            .values("names")
+        )
+        return self.update(
+            search_vector=(
+                SearchVector("name", weight="A", config=config)
+                + SearchVector("text", weight="B", config=config)
+                + SearchVector(
+                    Subquery(ingredient_names), weight="C", config=config
+                )
+            )
+        )
+
+    def search(self, value):
+        if self.is_postgresql():
+            query = SearchQuery(
+                value,
+                config=settings.RECIPE_SEARCH_CONFIG,
+                search_type="websearch",
+            )
+            return (
+                self.filter(search_vector=query)
+                .annotate(rank=SearchRank(F("search_vector"), query))
+                .order_by("-rank", *Recipe._meta.ordering)
+            )
+        words = value.split()
+        recipes = self
+        rank = Value(0.0)
+        for word in words:
+            recipes = recipes.filter(
+                Q(name__icontains=word)
+                | Q(text__icontains=word)
+                | Q(
+                    pk__in=RecipeIngredient.objects.filter(
+                        ingredient__name__icontains=word
+                    ).values("recipe")
+                )
+            )
+            rank += Case(
+                When(name__icontains=word, then=Value(1.0)),
+                When(text__icontains=word, then=Value(0.4)),
+                default=Value(0.2),
+                output_field=FloatField(),
+            )
+        return recipes.annotate(rank=rank).order_by(
+            "-rank", *Recipe._meta.ordering
+        )
+
 
 class Recipe(models.Model):
     author = models.ForeignKey(
@@ -90,6 +189,12 @@ class Recipe(models.Model):
     )
     name = models.CharField(verbose_name="Название", max_length=200)
     image = models.ImageField(verbose_name="Картинка")
+    image_variants = models.JSONField(
+        verbose_name="Уменьшенные копии картинки",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(verbose_name="Описание")
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -100,11 +205,43 @@ class Recipe(models.Model):
         verbose_name="Время приготовления (в минутах)",
         validators=[MinValueValidator(1)],
     )
+    pub_date = models.DateTimeField(
+        verbose_name="Дата публикации", auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        verbose_name="Дата изменения", auto_now=True
+    )
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый вектор", null=True, editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="Добавлений в избранное", default=0, editable=False
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        verbose_name="Добавлений в списки покупок", default=0, editable=False
+    )
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
+        ordering = ("-pub_date", "-id")
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="recipe_author_pub_date_idx",
+            ),
+            GinIndex(
+                fields=["search_vector"], name="recipe_search_vector_idx"
+            ),
+            models.Index(
+                fields=["-favorites_count", "-pub_date", "-id"],
+                name="recipe_favorites_count_idx",
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["name", "author"], name="unique_name_author_recipe"
@@ -145,6 +282,11 @@ class RecipeTag(models.Model):
     class Meta:
         verbose_name = "Тег в рецепте"
         verbose_name_plural = "Теги в рецепте"
+        indexes = [
+            models.Index(
+                fields=["tag", "recipe"], name="recipetag_tag_recipe_idx"
+            )
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["recipe", "tag"], name="unique_recipe_tag"
@@ -192,6 +334,130 @@ class ShoppingCard(models.Model):
         ]
 
 
+def lock_recipes(recipe_ids):
+    list(
+        Recipe.objects.filter(pk__in=recipe_ids)
+        .order_by("pk")
+        .select_for_update()
+        .values_list("pk", flat=True)
+    )
+
+
+def lock_users(user_ids):
+    list(
+        User.objects.filter(pk__in=user_ids)
+        .order_by("pk")
+        .select_for_update()
+        .values_list("pk", flat=True)
+    )
+
+
+class ShoppingCartIngredientQuerySet(models.QuerySet):
+    def apply_deltas(self, user_ids, deltas):
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items()
+            if delta
+        }
+        if not user_ids or not deltas:
+            return
+        lock_users(user_ids)
+        rows = self.filter(user_id__in=user_ids, ingredient_id__in=deltas)
+        existing = set(
+            rows.select_for_update().values_list("user_id", "ingredient_id")
+        )
+        rows.update(
+            amount=F("amount")
+            + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(delta))
+                    for ingredient_id, delta in deltas.items()
+                ),
+                default=Value(0),
+                output_field=models.IntegerField(),
+            )
+        )
+        self.bulk_create(
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=delta
+            )
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items()
+            if delta > 0 and (user_id, ingredient_id) not in existing
+        )
+        rows.filter(amount__lte=0).delete()
+
+    def apply_recipe(self, user_ids, recipe, sign=1):
+        deltas = {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in recipe.recipe_ingredients.values_list(
+                "ingredient_id", "amount"
+            )
+        }
+        self.apply_deltas(user_ids, deltas)
+
+    def apply_recipes(self, user_ids, recipe_ids, sign=1):
+        if not recipe_ids:
+            return
+        totals = (
+            RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+            .values_list("ingredient_id")
+            .annotate(total_amount=Sum("amount"))
+            .order_by()
+        )
+        self.apply_deltas(
+            user_ids,
+            {ingredient_id: sign * amount for ingredient_id, amount in totals},
+        )
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        related_name="shopping_cart_ingredients",
+        on_delete=models.CASCADE,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        related_name="shopping_cart_ingredients",
+        on_delete=models.CASCADE,
+    )
+    amount = models.IntegerField(verbose_name="Количество")
+    objects = ShoppingCartIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Ингредиент в списке покупок"
+        verbose_name_plural = "Ингредиенты в списках покупок"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name="unique_user_shopping_cart_ingredient",
+            )
+        ]
+
+
+class FollowQuerySet(models.QuerySet):
+    def with_author_data(self, recipes_limit=None):
+        recipes = Recipe.objects.all()
+        if recipes_limit is not None:
+            recipes = recipes.filter(
+                pk__in=Recipe.objects.filter(author=OuterRef("author"))
+                .order_by(*Recipe._meta.ordering)
+                .values("pk")[:recipes_limit]
+            )
+        return (
+            self.select_related("author")
+            .annotate(recipes_count=Count("author__recipes"))
+            .prefetch_related(
+                Prefetch(
+                    "author__recipes",
+                    queryset=recipes,
+                    to_attr="subscription_recipes",
+                )
+            )
+        )
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -205,10 +471,14 @@ class Follow(models.Model):
         related_name="following",
         verbose_name="Автор",
     )
+    objects = FollowQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        indexes = [
+            models.Index(fields=["user", "-id"], name="follow_user_id_idx")
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=["user", "author"], name="unique_user_author"
@@ -0,0 +1,90 @@
+from django.db.models import OuterRef
+
+from recipes.models import Follow, Recipe, ShoppingCartIngredient
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+ORDERED_WALK_QUERIES = {"Рецепты по тегам"}
+
+
+def find_full_scans(plan, large_relations, walks_allowed=False, limited=False):
+    node_type = plan["Node Type"]
+    relation = plan.get("Relation Name")
+    if relation in large_relations and (
+        node_type == "Seq Scan"
+        or node_type in INDEX_SCANS
+        and "Index Cond" not in plan
+        and not walks_allowed
+        and not (limited and "Filter" not in plan)
+    ):
+        yield relation
+    passes_limit = node_type == "Limit" or (
+        node_type == "Result" and limited and "Filter" not in plan
+    )
+    for subplan in plan.get("Plans", []):
+        yield from find_full_scans(
+            subplan,
+            large_relations,
+            walks_allowed,
+            passes_limit and subplan["Parent Relationship"] == "Outer",
+        )
+
+
+def get_hot_queries(user_id):
+    recipes = Recipe.objects.annotate_user_data(user_id)
+    return {
+        "Лента рецептов": recipes[:6],
+        "Рецепты автора": recipes.filter(author_id=user_id)[:6],
+        "Рецепты по тегам": recipes.filter(
+            tags__slug__in=["breakfast", "dinner"]
+        ).distinct()[:6],
+        "Лента подписок": recipes.followed_by(user_id)[:6],
+        "Избранные рецепты": recipes.filter(is_favorited=True)[:6],
+        "Рецепты в списке покупок": recipes.filter(
+            is_in_shopping_cart=True
+        )[:6],
+        "Проверка подписки": Follow.objects.filter(
+            user_id=user_id, author_id=user_id
+        ),
+        "Подписки": Follow.objects.filter(user_id=user_id)
+        .with_author_data()
+        .order_by("-id")[:6],
+        "Рецепты в подписках": Recipe.objects.filter(
+            author_id__in=[user_id],
+            pk__in=Recipe.objects.filter(author=OuterRef("author"))
+            .order_by(*Recipe._meta.ordering)
+            .values("pk")[:3],
+        ),
+        "Список покупок": ShoppingCartIngredient.objects.filter(
+            user_id=user_id
+        )
+        .values_list(
+            "ingredient__name", "ingredient__measurement_unit", "amount"
+        )
+        .order_by("ingredient__name"),
+    }
+
+
+def explain(cursor, queryset):
+    sql, params = queryset.query.sql_with_params()
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    return cursor.fetchone()[0][0]
+
+
+def get_large_relations(cursor, min_rows):
+    cursor.execute(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples >= %s",
+        [min_rows],
+    )
+    return {relname for relname, in cursor.fetchall()}
+
+
+def check_hot_queries(cursor, user_id, min_rows):
+    large_relations = get_large_relations(cursor, min_rows)
+    for name, queryset in get_hot_queries(user_id).items():
+        plan = explain(cursor, queryset)
+        full_scans = find_full_scans(
+            plan["Plan"],
+            large_relations,
+            walks_allowed=name in ORDERED_WALK_QUERIES,
+        )
+        yield name, plan, list(full_scans)
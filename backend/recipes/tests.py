@@ -0,0 +1,142 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from recipes.generators import DataGenerator, TableWriter
+from recipes.loaders import CatalogLoader
+from recipes.models import Ingredient, ShoppingCartIngredient, Tag
+from recipes.query_plans import check_hot_queries
+
+User = get_user_model()
+
+
+def run_concurrently(*functions):
+    barrier = threading.Barrier(len(functions))
+
+    def run(function):
+        try:
+            with transaction.atomic():
+                barrier.wait()
+                function()
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(functions)) as executor:
+        futures = [executor.submit(run, function) for function in functions]
+    return [
+        future.exception() for future in futures if future.exception()
+    ]
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ShoppingCartIngredientConcurrencyTest(TransactionTestCase):
+    def test_concurrent_inserts_of_new_row_are_summed(self):
+        user = User.objects.create_user(
+            username="user", email="user@example.com", password="password"
+        )
+        ingredient = Ingredient.objects.create(
+            name="Ингредиент", measurement_unit="г"
+        )
+
+        def add():
+            ShoppingCartIngredient.objects.apply_deltas(
+                [user.pk], {ingredient.pk: 3}
+            )
+
+        self.assertEqual(run_concurrently(add, add), [])
+        self.assertEqual(
+            ShoppingCartIngredient.objects.get(
+                user=user, ingredient=ingredient
+            ).amount,
+            6,
+        )
+
+
+class TagLoaderTest(TestCase):
+    rows = [
+        {"name": "Завтрак", "color": "#E26C2D", "slug": "morning"},
+        {"name": "Обед", "color": "#49B64E", "slug": "lunch"},
+        {"name": "Обед", "color": "#49B64E", "slug": "lunch"},
+        {"name": "Обед", "color": "#8775D2", "slug": "lunch2"},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name="Завтрак", color="#E26C2D", slug="breakfast")
+
+    def assert_loaded(self, load):
+        loader = CatalogLoader(Tag, ("name", "color", "slug"), ("slug",))
+        getattr(loader, load)(self.rows)
+        self.assertEqual(
+            (loader.inserted, loader.updated, loader.skipped), (1, 0, 1)
+        )
+        self.assertEqual(loader.conflicts, [("lunch2",), ("morning",)])
+        self.assertEqual(
+            list(Tag.objects.order_by("slug").values_list("slug", flat=True)),
+            ["breakfast", "lunch"],
+        )
+
+    def test_name_conflicts_are_reported(self):
+        self.assert_loaded("bulk_upsert")
+
+    @skipUnless(connection.vendor == "postgresql", "COPY для PostgreSQL")
+    def test_name_conflicts_are_reported_with_copy(self):
+        self.assert_loaded("copy_upsert")
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN для PostgreSQL")
+class HotQueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        tag_ids = [
+            Tag.objects.create(name=name, color=color, slug=slug).pk
+            for name, color, slug in [
+                ("Завтрак", "#E26C2D", "breakfast"),
+                ("Обед", "#49B64E", "lunch"),
+                ("Ужин", "#8775D2", "dinner"),
+            ]
+        ]
+        ingredient_ids = [
+            Ingredient.objects.create(
+                name=f"Ингредиент {number}", measurement_unit="г"
+            ).pk
+            for number in range(20)
+        ]
+        generator = DataGenerator(
+            0, 300, 3000, 3000, 6000, 1000, tag_ids, ingredient_ids
+        )
+        writer = TableWriter(use_copy=True, batch_size=5000)
+        for model, fields, get_rows in generator.get_tables():
+            writer.write(model, fields, get_rows())
+        generator.build_shopping_lists()
+        generator.reset_sequences()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        cls.user_id = (
+            User.objects.annotate(
+                follows_count=Count("follower", distinct=True),
+                favorites_count=Count("favorites", distinct=True),
+                shopping_cart_count=Count("shopping_card", distinct=True),
+            )
+            .filter(
+                follows_count__range=(1, 5),
+                favorites_count__range=(1, 20),
+                shopping_cart_count__range=(1, 20),
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+            .first()
+        )
+
+    def test_hot_queries_have_indexes(self):
+        with connection.cursor() as cursor:
+            for name, plan, full_scans in check_hot_queries(
+                cursor, self.user_id, min_rows=1000
+            ):
+                with self.subTest(query=name):
+                    self.assertEqual(full_scans, [])
@@ -25,6 +25,14 @@ class RoleFilter(admin.SimpleListFilter):
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
-    list_display = ("pk", "email", "username", "first_name", "last_name")
+    list_display = (
+        "pk",
+        "email",
+        "username",
+        "first_name",
+        "last_name",
+        "followers_count",
+        "recipes_count",
+    )
     search_fields = ("email", "username", "first_name", "last_name")
     list_filter = (RoleFilter,)
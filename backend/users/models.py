@@ -26,6 +26,12 @@ class User(AbstractUser):
     first_name = models.CharField(verbose_name="Имя", max_length=150)
     last_name = models.CharField(verbose_name="Фамилия", max_length=150)
     password = models.CharField(verbose_name="Пароль", max_length=150)
+    followers_count = models.PositiveIntegerField(
+        verbose_name="Количество подписчиков", default=0, editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Количество рецептов", default=0, editable=False
+    )
 
     class Meta:
         verbose_name = "Пользователь"